@@ -0,0 +1,152 @@
+import argparse
+import csv
+import time
+from itertools import combinations
+
+import numpy as np
+
+from score_tables import MODEL_NAMES, load_exports
+
+# ========== 标注一致性分析 ==========
+# 每条样本分给 3 位教师（见 splilte_data.py），这里读取各位教师导出的评分 CSV，
+# 按分组（part1 评分维度 / part2 块类型 / part3 评分项）和模型计算：
+#   Krippendorff's alpha  允许缺失评分，按维度的测量尺度选择距离（名义 / 定序 / 等距）
+#   Fleiss' kappa         名义一致性（每个评分对象的评分人数可以不同）
+#   Cohen's kappa         两两教师之间的名义一致性，报告各教师对的平均值
+# 所有系数都基于 [评分对象 × 类别] 的计数矩阵，用矩阵运算一次算完。
+#
+# 用法：python agreement.py --file 评分结果_T001_*.csv 评分结果_T002_*.csv ... [--out agreement.csv]
+
+# 测量尺度：未列出的维度（0/1 判断题等）按名义尺度
+LEVELS = {
+    "整体偏好排序（主观倾向）": "ordinal",
+    "过程正确": "interval",
+    "提问质量": "interval",
+    "语言流畅度": "interval",
+    "导正话题": "ordinal",
+}
+
+ALL_MODELS = "全部模型"
+
+
+def category_counts(mat):
+    """(评分对象 × 教师) 分值矩阵 -> 至少两人评分的对象的 (对象 × 类别) 计数矩阵、类别取值。"""
+    mask = ~np.isnan(mat)
+    keep = mask.sum(axis=1) >= 2
+    mat, mask = mat[keep], mask[keep]
+    cats, inv = np.unique(mat[mask], return_inverse=True)
+    rows = np.nonzero(mask)[0]
+    counts = np.bincount(rows * len(cats) + inv, minlength=len(mat) * len(cats))
+    return counts.reshape(len(mat), len(cats)).astype(np.float64), cats
+
+
+def _delta(cats, n_c, level):
+    if level == "interval":
+        return (cats[:, None] - cats[None, :]) ** 2
+    if level == "ordinal":
+        cum = np.cumsum(n_c)
+        idx = np.arange(len(cats))
+        lo = np.minimum(idx[:, None], idx[None, :])
+        hi = np.maximum(idx[:, None], idx[None, :])
+        between = cum[hi] - cum[lo] + n_c[lo]
+        return (between - (n_c[:, None] + n_c[None, :]) / 2) ** 2
+    return 1.0 - np.eye(len(cats))
+
+
+def krippendorff_alpha(counts, cats, level="nominal"):
+    if counts.shape[0] == 0 or len(cats) < 2:
+        return float("nan")
+    m_u = counts.sum(axis=1)
+    weighted = counts / (m_u - 1)[:, None]
+    # 符合矩阵 o[c, k]：同一对象内 (c, k) 评分对的加权个数
+    coincidence = weighted.T @ counts - np.diag(weighted.sum(axis=0))
+    n_c = coincidence.sum(axis=1)
+    n = n_c.sum()
+    delta = _delta(cats, n_c, level)
+    d_o = (coincidence * delta).sum() / n
+    d_e = (np.outer(n_c, n_c) * delta).sum() / (n * (n - 1))
+    return float(1 - d_o / d_e) if d_e > 0 else float("nan")
+
+
+def fleiss_kappa(counts):
+    if counts.shape[0] == 0:
+        return float("nan")
+    m_u = counts.sum(axis=1)
+    p_i = ((counts ** 2).sum(axis=1) - m_u) / (m_u * (m_u - 1))
+    p_j = counts.sum(axis=0) / counts.sum()
+    p_e = (p_j ** 2).sum()
+    return float((p_i.mean() - p_e) / (1 - p_e)) if p_e < 1 else float("nan")
+
+
+def cohen_kappa_pairs(mat):
+    """各教师对（共同评分至少 2 个对象）的 Cohen's kappa：[(教师下标 a, 教师下标 b, kappa)]。"""
+    result = []
+    for a, b in combinations(range(mat.shape[1]), 2):
+        both = ~np.isnan(mat[:, a]) & ~np.isnan(mat[:, b])
+        if both.sum() < 2:
+            continue
+        x, y = mat[both, a], mat[both, b]
+        cats, inv = np.unique(np.concatenate([x, y]), return_inverse=True)
+        k = len(cats)
+        confusion = np.bincount(inv[:len(x)] * k + inv[len(x):], minlength=k * k).reshape(k, k) / len(x)
+        p_o = np.trace(confusion)
+        p_e = confusion.sum(axis=1) @ confusion.sum(axis=0)
+        result.append((a, b, float((p_o - p_e) / (1 - p_e)) if p_e < 1 else float("nan")))
+    return result
+
+
+def agreement_table(table) -> list:
+    rows = []
+    for (part, dimension), group_rows in table.groups().items():
+        level = LEVELS.get(dimension, "nominal")
+        selections = [(name, group_rows[table.model[group_rows] == m]) for m, name in enumerate(MODEL_NAMES)]
+        selections.append((ALL_MODELS, group_rows))
+        for model_name, rows_idx in selections:
+            mat, _ = table.matrix(rows_idx)
+            counts, cats = category_counts(mat)
+            pairs = cohen_kappa_pairs(mat)
+            cohen = [k for _, _, k in pairs if not np.isnan(k)]
+            rows.append({
+                "part": part,
+                "dimension": dimension,
+                "model": model_name,
+                "level": level,
+                "objects": counts.shape[0],
+                "ratings": int(counts.sum()),
+                "alpha": krippendorff_alpha(counts, cats, level),
+                "fleiss_kappa": fleiss_kappa(counts),
+                "cohen_kappa_mean": float(np.mean(cohen)) if cohen else float("nan"),
+                "cohen_pairs": len(cohen),
+            })
+    return rows
+
+
+def _fmt(v):
+    return "   -  " if isinstance(v, float) and np.isnan(v) else f"{v:6.3f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="计算多位教师评分之间的一致性（Krippendorff's alpha / Fleiss' kappa / Cohen's kappa）")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="各教师导出的评分 CSV，如 评分结果_T001_20250601_1200.csv")
+    parser.add_argument("--out", type=str, default=None, help="结果另存为 CSV")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = load_exports(args.file)
+    loaded = time.perf_counter()
+    result = agreement_table(table)
+    done = time.perf_counter()
+
+    print(f"✅ 读取 {len(args.file)} 个文件（{len(table.teachers)} 位教师，{len(table)} 条评分），"
+          f"读取 {loaded - start:.2f}s，计算 {done - loaded:.2f}s")
+    print(f"{'part':<6} {'维度':<16} {'模型':<12} {'尺度':<8} {'对象数':>6} {'alpha':>7} {'fleiss':>7} {'cohen':>7}")
+    for r in result:
+        print(f"{r['part']:<6} {r['dimension'][:14]:<16} {r['model']:<12} {r['level']:<8} {r['objects']:>6} "
+              f"{_fmt(r['alpha'])} {_fmt(r['fleiss_kappa'])} {_fmt(r['cohen_kappa_mean'])}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(result[0]) if result else ["part"])
+            writer.writeheader()
+            writer.writerows(result)
+        print(f"✅ 已写入 {args.out}")
@@ -1,47 +1,84 @@
+import os
 import random
-import streamlit as st
-import pandas as pd
-import json
 import re
+from contextlib import contextmanager
+import pandas as pd
+import streamlit as st
 from datetime import datetime
-import base64
+import data_store
+import export_scores
+import metrics
+import prefetch
+import ranking
+import render_cache
+import score_store
+from score_model import RANK_DIMENSION
 
 # ========== 工具函数 ==========
 
-#渲染文本
-def render_latex_textblock(text):
-    pattern = re.compile(r"(\${1,2}.*?\${1,2})")
-    parts = pattern.split(text)
-    result = ""
-    for part in parts:
-        if part.startswith("$$") or part.startswith("$"):
-            result += part  # 保留 $ 符号，用于 markdown 渲染
-        else:
-            result += part.replace("\n", "<br>")  # 处理换行
-    st.markdown(result, unsafe_allow_html=True)
+#输出 markdown（页面上的 markdown 都经过这里，计入本次重跑发出的 markdown 字节数）
+def markdown(body, unsafe_allow_html=False):
+    metrics.add_markdown_bytes(len(body.encode("utf-8")))
+    st.markdown(body, unsafe_allow_html=unsafe_allow_html)
 
-#渲染对话轮
-def render_turn(turn: dict, model_name: str):
-    if "model_respond" in turn:
-        st.markdown(f"模型 {model_name}：")
-        render_latex_textblock(turn["model_respond"])
-    if "user" in turn:
-        st.markdown(f"学生：")
-        render_latex_textblock(turn["user"])
+#输出拼好的 HTML 片段
+def emit_html(html):
+    markdown(html, unsafe_allow_html=True)
+
+#渲染文本（拼好的片段按内容缓存在 render_cache 中）
+def render_latex_textblock(text):
+    emit_html(render_cache.textblock(text))
 
 
 #渲染竖分割线
 def render_vertical_divider():
-    st.markdown("""
+    markdown("""
         <div style='height: 75px; border-left: 1px solid lightgray; margin: auto 0;'>&nbsp;</div>
     """, unsafe_allow_html=True)
 
 real_keys = {"A": "DeepSeek-V3", "B": "o4-mini", "C": "Spark_X1"}
 
 
+# ========== part1 对话按轮次分批显示 ==========
+# 长对话一次性拼进滑动框会让页面很大、浏览器排版很慢。这里先只发送前 DIALOG_INITIAL_TURNS 轮，
+# 由“显示更多轮次”按需追加。三个模型的对话放在同一个滑动框的表格里（每轮一行、每个模型一列），
+# 共用同一个已显示轮数，第 i 轮始终并排对齐、一起滚动。
+# 已显示的轮数按样本记在 session_state 中，翻回来时保持不变。
+DIALOG_INITIAL_TURNS = 6
+DIALOG_MORE_TURNS = 6
+
+
+def _show_turns(shown_key, n):
+    # 按钮回调在本次（fragment）重跑之前执行，重跑时直接按新的轮数渲染
+    st.session_state[shown_key] = n
+
+
+@st.fragment
+@metrics.timed("render_part1_dialogs")
+def render_part1_dialogs(model_turns, model_names, poid, slot):
+    shown_key = f"part1_{poid}_shown_turns"
+    total = max((len(t) for t in model_turns), default=0)
+    shown = min(st.session_state.get(shown_key, DIALOG_INITIAL_TURNS), total)
+
+    # 第一轮的学生发言就是题目本身，不重复展示
+    emit_html(render_cache.dialog_table([t[:shown] for t in model_turns], slot, model_names, 650, skip_first_user=True))
+    hidden = [f"{name} 还有 {len(t) - shown} 轮" for t, name in zip(model_turns, model_names) if len(t) > shown]
+    if hidden:
+        st.caption("…… " + "，".join(hidden) + "未显示")
+
+    if shown < total:
+        more_col, all_col, _ = st.columns([1, 1, 2])
+        with more_col:
+            st.button(f"显示更多轮次（+{DIALOG_MORE_TURNS}）", key=f"{shown_key}_more",
+                      on_click=_show_turns, args=(shown_key, shown + DIALOG_MORE_TURNS))
+        with all_col:
+            st.button(f"显示全部 {total} 轮", key=f"{shown_key}_all",
+                      on_click=_show_turns, args=(shown_key, total))
+
+
 # ========== 展示布局的函数 ==========
-def display_part1(part1, poid):
-    st.markdown("### 🧩 Part 1: 模型答疑中的整体评价")
+def display_part1(part1, poid, sample_key):
+    markdown("### 🧩 Part 1: 模型答疑中的整体评价")
 
     model_map = st.session_state.model_shuffle_map[st.session_state.page]
     model_keys = [model_map[m] for m in ["1", "2", "3"]]
@@ -58,36 +95,18 @@ def display_part1(part1, poid):
 
     with col1:
 
-        st.markdown("#### 📊 模型 1 / 2 / 3 对该问题的答疑过程")
-
-        cols = st.columns(3)
-        for col, turns, name in zip(cols, model_turns, model_names):
-            with col:
-                st.markdown(f"##### 🤖 {name}")
-                blocks = []
-                blocks.append(" ")
-                for idx, turn in enumerate(turns):
-                    if "user" in turn and idx != 0:
-                        blocks.append(f"<span style='color:#1f77b4; font-weight:bold;'>学生：</span><br>{turn['user']}")
-                    if "model_respond" in turn:
-                        blocks.append(f"<span style='color:#d62728; font-weight:bold;'>{name}：</span><br>{turn['model_respond']}")
-                    if idx < len(turns) - 1:
-                        blocks.append("---")
-                content = "\n\n".join(blocks)
-                st.markdown(f"""
-                <div style='height: 650px; overflow-y: auto; padding-right:10px; border: 1px solid #ccc; border-radius: 10px; padding: 10px; background-color: #f9f9f9;'>
-                {content}
-                </div>
-                """, unsafe_allow_html=True)
+        markdown("#### 📊 模型 1 / 2 / 3 对该问题的答疑过程")
+        render_part1_dialogs(model_turns, model_names, poid, sample_key + ("part1", tuple(model_keys)))
 
     with col2:
-        st.markdown("#### ⭐ 评分表单部分")
-        render_part1_scoring(poid)
+        markdown("#### ⭐ 评分表单部分")
+        with part_form("part1", poid):
+            scoring_panel(render_part1_grid if grid_mode() else render_part1_scoring)(poid)
 
-    st.markdown("<div style='height: 100px;'></div>", unsafe_allow_html=True)
+    markdown("<div style='height: 100px;'></div>", unsafe_allow_html=True)
 
-def display_part2(part2_list, poid):
-    st.markdown("### 🧪 Part 2: 模型在引导解题和引导话题上的评价")
+def display_part2(part2_list, poid, sample_key):
+    markdown("### 🧪 Part 2: 模型在引导解题和引导话题上的评价")
     type_map = {1: "✅ 理解（do）", 2: "❌ 不理解（don’t）", 3: "💬 无关回答（noise）"}
 
     model_map = st.session_state.model_shuffle_map[st.session_state.page]
@@ -95,217 +114,236 @@ def display_part2(part2_list, poid):
     model_names = ["模型1", "模型2", "模型3"]
     real_keys = {"A": "DeepSeek-V3", "B": "o4-mini", "C": "Spark_X1"}
 
-    for idx, block in enumerate(part2_list):
-        st.markdown(f"#### {type_map[block['type']]} 类型")
-
-        # === 展示题干 ===
-        col_a, col_mid1, col_b, col_mid2, col_c = st.columns([1, 0.03, 1, 0.03, 1])
-        with col_a:
-            st.markdown(f"**{model_names[0]} 的题目：**")
-            model_data = block["content"][real_keys[model_keys[0]]]
-            render_latex_textblock(model_data.get("question", "（无题目）"))
-        with col_mid1:
-            render_vertical_divider()
-        with col_b:
-            st.markdown(f"**{model_names[1]} 的题目：**")
-            model_data = block["content"][real_keys[model_keys[1]]]
-            render_latex_textblock(model_data.get("question", "（无题目）"))
-        with col_mid2:
-            render_vertical_divider()
-        with col_c:
-            st.markdown(f"**{model_names[2]} 的题目：**")
-            model_data = block["content"][real_keys[model_keys[2]]]
-            render_latex_textblock(model_data.get("question", "（无题目）"))
+    with part_form("part2", poid):
+        for idx, block in enumerate(part2_list):
+            markdown(f"#### {type_map[block['type']]} 类型")
+
+            # === 展示题干 ===
+            col_a, col_mid1, col_b, col_mid2, col_c = st.columns([1, 0.03, 1, 0.03, 1])
+            with col_a:
+                markdown(f"**{model_names[0]} 的题目：**")
+                model_data = block["content"][real_keys[model_keys[0]]]
+                render_latex_textblock(model_data.get("question", "（无题目）"))
+            with col_mid1:
+                render_vertical_divider()
+            with col_b:
+                markdown(f"**{model_names[1]} 的题目：**")
+                model_data = block["content"][real_keys[model_keys[1]]]
+                render_latex_textblock(model_data.get("question", "（无题目）"))
+            with col_mid2:
+                render_vertical_divider()
+            with col_c:
+                markdown(f"**{model_names[2]} 的题目：**")
+                model_data = block["content"][real_keys[model_keys[2]]]
+                render_latex_textblock(model_data.get("question", "（无题目）"))
+
+            # === 构造对话 turns ===
+            turns = []
+            for key in model_keys:
+                model_data = block["content"][real_keys[key]]
+                if isinstance(model_data, dict) and "dialogue" in model_data:
+                    turns.append(model_data["dialogue"])
+                else:
+                    turns.append(model_data)
 
-        # === 构造对话 turns ===
-        turns = []
-        for key in model_keys:
-            model_data = block["content"][real_keys[key]]
-            if isinstance(model_data, dict) and "dialogue" in model_data:
-                turns.append(model_data["dialogue"])
-            else:
-                turns.append(model_data)
+            # === 展示对话内容（滑动容器） ===
+            col_a, col_mid1, col_b, col_mid2, col_c = st.columns([1, 0.03, 1, 0.03, 1])
+            for col, t_list, name, model_key in zip([col_a, col_b, col_c], turns, model_names, model_keys):
+                with col:
+                    markdown(f"**{name} 的对话过程：**")
+                    emit_html(render_cache.dialog_panel(t_list, sample_key + ("part2", idx, model_key), name, 400))
 
-        # === 展示对话内容（滑动容器） ===
-        col_a, col_mid1, col_b, col_mid2, col_c = st.columns([1, 0.03, 1, 0.03, 1])
-        for col, t_list, name in zip([col_a, col_b, col_c], turns, model_names):
-            with col:
-                st.markdown(f"**{name} 的对话过程：**")
-                blocks = []
-                blocks.append(" ")
-                for i, turn in enumerate(t_list):
-                    if "user" in turn:
-                        blocks.append(f"<span style='color:#1f77b4; font-weight:bold;'>学生：</span><br>{turn['user']}")
-                    if "model_respond" in turn:
-                        blocks.append(f"<span style='color:#d62728; font-weight:bold;'>{name}：</span><br>{turn['model_respond']}")
-                    if i < len(t_list) - 1:
-                        blocks.append("---")
-                content = "\n\n".join(blocks)
-                st.markdown(f"""
-                <div style='height: 400px; overflow-y: auto; padding-right:10px; border: 1px solid #ccc; border-radius: 10px; padding: 10px; background-color: #f9f9f9;'>
-                {content}
-                </div>
-                """, unsafe_allow_html=True)
-
-        render_part2_scoring([block], f"{poid}_idx{idx}")
-        st.markdown("<div style='height: 50px;'></div>", unsafe_allow_html=True)
+            scoring_panel(render_part2_scoring)([block], poid, idx)
+            markdown("<div style='height: 50px;'></div>", unsafe_allow_html=True)
 
 def display_part3(part3_list, poid):
-    st.markdown("### 🎯 Part 3: 单轮反馈能力评估")
+    markdown("### 🎯 Part 3: 单轮反馈能力评估")
 
     model_map = st.session_state.model_shuffle_map[st.session_state.page]
     model_keys = [model_map[m] for m in ["1", "2", "3"]]
     model_names = ["模型1", "模型2", "模型3"]
     real_keys = {"A": "DeepSeek-V3", "B": "o4-mini", "C": "Spark_X1"}
 
-    for item in part3_list:
-        # 强调类型
-        st.markdown(f"<div style='font-size: 22px; font-weight: bold; color: #c0392b; background-color: #fdecea; padding: 8px 12px; border-radius: 6px; display: inline-block;'>类型：{item['type']}</div>", unsafe_allow_html=True)
+    with part_form("part3", poid):
+        for item in part3_list:
+            # 强调类型
+            markdown(f"<div style='font-size: 22px; font-weight: bold; color: #c0392b; background-color: #fdecea; padding: 8px 12px; border-radius: 6px; display: inline-block;'>类型：{item['type']}</div>", unsafe_allow_html=True)
 
-        st.markdown(" ")
-        st.markdown("**题目：**")
-        render_latex_textblock(item["question"])
+            markdown(" ")
+            markdown("**题目：**")
+            render_latex_textblock(item["question"])
 
-        st.markdown("**上轮模型问题：**")
-        render_latex_textblock(item["last_model_reply"])
+            markdown("**上轮模型问题：**")
+            render_latex_textblock(item["last_model_reply"])
 
-        # 三列展示模型回复（每列一个滑动框，拼接HTML + LaTeX 保留）
-        col_a, col_mid1, col_b, col_mid2, col_c = st.columns([1, 0.03, 1, 0.03, 1])
-        for col, key, name in zip([col_a, col_b, col_c], model_keys, model_names):
-            with col:
-                st.markdown(f"**{name} 回复：**")
+            # 三列展示模型回复（每列一个滑动框，拼接HTML + LaTeX 保留）
+            col_a, col_mid1, col_b, col_mid2, col_c = st.columns([1, 0.03, 1, 0.03, 1])
+            for col, key, name in zip([col_a, col_b, col_c], model_keys, model_names):
+                with col:
+                    markdown(f"**{name} 回复：**")
+
+                    model_text = item["single_dialog"][real_keys[key]]
+                    user_text = item["single_dialog"]["user"]
 
-                model_text = item["single_dialog"][real_keys[key]]
-                user_text = item["single_dialog"]["user"]
+                    # 拼接 HTML 内容，LaTeX 保留
+                    emit_html(render_cache.single_panel(user_text, model_text, name, 250))
 
-                # 拼接 HTML 内容，LaTeX 保留
-                blocks =[]
-                blocks.append("")
-                blocks.append(f"<span style='color:#1f77b4; font-weight:bold;'>学生：</span><br>{user_text}")
-                blocks.append(f"<span style='color:#d62728; font-weight:bold;'>{name}：</span><br>{model_text}")
+            markdown("**学生正确参考：**")
+            render_latex_textblock(item["single_dialog"]["gt"])
 
-                content = "\n\n".join(blocks)
+            scoring_panel(render_part3_scoring)(item, poid)
+            markdown("<div style='height: 100px;'></div>", unsafe_allow_html=True)
 
-                st.markdown(f"""
-                <div style='height: 250px; overflow-y: auto; padding-right:10px;
-                            border: 1px solid #ccc; border-radius: 10px;
-                            padding: 10px; background-color: #f9f9f9;'>
-                {content}
-                </div>
-                """, unsafe_allow_html=True)
 
-        st.markdown("**学生正确参考：**")
-        render_latex_textblock(item["single_dialog"]["gt"])
+# 预先拼好某条样本页面上的全部文本片段（与 display_part1/2/3 的调用一一对应），
+# 由后台预取线程调用，只能使用 render_cache，不能调用 st.*
+def prerender_sample(sample, model_map, sample_key):
+    model_keys = [model_map[m] for m in ["1", "2", "3"]]
+    model_names = ["模型1", "模型2", "模型3"]
+    content = sample["content"]
+
+    part1 = content["part1"]
+    render_cache.textblock(part1["question"])
+    if "answer" in part1:
+        render_cache.textblock(part1["answer"])
+    render_cache.dialog_table([part1.get(real_keys[k], [])[:DIALOG_INITIAL_TURNS] for k in model_keys],
+                              sample_key + ("part1", tuple(model_keys)), model_names, 650, skip_first_user=True)
+
+    for block_idx, block in enumerate(content["part2"]):
+        for model_key, name in zip(model_keys, model_names):
+            model_data = block["content"][real_keys[model_key]]
+            render_cache.textblock(model_data.get("question", "（无题目）"))
+            t_list = model_data["dialogue"] if isinstance(model_data, dict) and "dialogue" in model_data else model_data
+            render_cache.dialog_panel(t_list, sample_key + ("part2", block_idx, model_key), name, 400)
+
+    for item in content["part3"]:
+        render_cache.textblock(item["question"])
+        render_cache.textblock(item["last_model_reply"])
+        render_cache.textblock(item["single_dialog"]["gt"])
+        for key, name in zip(model_keys, model_names):
+            render_cache.single_panel(item["single_dialog"]["user"], item["single_dialog"][real_keys[key]], name, 250)
+
+
+# 第 idx 条样本的模型顺序混淆（首次访问或预取时生成，之后保持不变）
+def ensure_model_shuffle(idx):
+    if "model_shuffle_map" not in st.session_state:
+        st.session_state.model_shuffle_map = {}
 
-        render_part3_scoring(item, poid)
-        st.markdown("<div style='height: 100px;'></div>", unsafe_allow_html=True)
+    if idx not in st.session_state.model_shuffle_map:
+        shuffled = ["A", "B", "C"]
+        random.shuffle(shuffled)
+        st.session_state.model_shuffle_map[idx] = dict(zip(["1", "2", "3"], shuffled))
+    return st.session_state.model_shuffle_map[idx]
 
 
 # ========== 评分表单的函数 ==========
-
+# 默认每个评分面板都是独立的 fragment：改动其中一个控件只重跑这个面板，
+# 不会重新渲染三栏对话框和其它 part（见 scoring_panel）。
+
+# part1 各评分维度的控件类型和评分说明（经典布局和紧凑表格共用）
+PART1_CONTROLS = {
+    "整体偏好排序（主观倾向）": "rank",
+    "最终答案正确": "radio",
+    "过程正确": "slider_float",
+    "提问质量": "slider_float",
+    "语言流畅度": "slider_int",
+    "是否指出知识点": "radio",
+    "知识点内容是否正确": "radio",
+    "是否分步讲解": "radio"
+
+}
+
+PART1_DESCRIPTIONS = {
+    "整体偏好排序（主观倾向）": (
+        "📌 阅读以上三个模型的答疑对话后，假设你需要从中选择一个用于实际学生答疑。"
+        "<br><b>请根据主观判断，对三个模型在该问题上的表现进行偏好排序</b>（排在前面的表示你最倾向选择的模型）。"
+        "<br><b>参考维度：</b>讲解内容是否合适、方法是否符合教学、语言是否易懂等。"
+    ),
+    "语言流畅度": (
+        "📌 请为上面对话中模型的语言流畅度打分。"
+        "<br><b>满分（10）标准：</b>语言符合语法、表达简洁准确、清晰易懂，沟通过程中不显得重复或冗长。"
+        "<br>⚠️ 注意：若模型表达虽准确但较为啰嗦，建议扣除部分分数。"
+
+    ),
+    "是否指出知识点": (
+        "📌 模型是否明显告知了该题涉及的知识点，比如“这个题目主要考察...”等表述，<b>且知识点正确</b>。"
+        "<br><b>选择 1 表示有明确指出，0 表示没有。</b>"
+    ),
+    "知识点内容是否正确": (
+        "📌 判断对话中提及的知识点、概念描述是否<b>都是正确的</b>。"
+        "<br><b>是：1，否：0。</b>"
+    ),
+    "最终答案正确": (
+        "📌 判断模型是否给出了<b>最终答案</b>，以及该答案是否<b>正确</b>。"
+        "<br>如果问题是多小问的，那么最后一小问的答案视为<b>最终答案</b>。"
+        "<br>如果对话还没有推进到最终答案阶段就结束了，<b>视为未给出答案：0</b>。"
+        "<br><b>正确：1，不正确或未给出：0。</b>"
+    ),
+    "过程正确": (
+        "📌 判断模型在逐步讲解过程中，<b>正确部分占比</b>是多少。"
+        "<br>例如："
+        "<br>- 正确了一半 → 分数 0.5；"
+        "<br>- 正确两个小问中的一个 → 分数 0.5；"
+        "<br>- 全过程正确但结尾错误 → 分数 0.9。"
+    ),
+    "是否分步讲解": (
+        "📌 判断模型是否<b>遵循分步骤</b>进行讲解，即每轮引导学生推进一步，而不是一股脑输出全部回答。"
+        "<br><b>是：1，否（直接给结果或存在跳跃性推导）：0。</b>"
+    ),
+    "提问质量": (
+        "📌 判断模型在讲解过程中提出的<b>高质量问题比例</b>："
+        "<br>请参考以下提问分级标准，判断模型在对话中是否提出了促进学生深入思考的问题，并据此评估其高质量提问所占的比例（0~1）："
+        "<br>（1）<b>低级提问</b> - 仅为确认或重复"
+        "<br>  典型方式：如“你明白了吗？”“你记住了吗？”"
+        "<br>（2）<b>中等提问</b> - 促使学生进行操作或尝试"
+        "<br>  典型方式：如“你能试着算一下这个表达式吗？”“请你告诉我这个式子的结果是多少。”"
+        "<br>（3）<b>高级提问</b> - 引导学生进行分析、推理、评价或创造"
+        "<br>  引导下一步：如“我们已经知道……，下一步该怎么做？”“根据现在的条件，你能得出什么结论？”"
+        "<br>  评价/创造类：如“这个题有没有其他解法？”“你能设计一个类似的问题吗？”"
+        "<br><br><b>评分建议：</b>"
+        "<br>- 若对话中基本没有提问，或只有少量低级提问 → 可给 0.0~0.3；"
+        "<br>- 若基本上低级，偶有中级 → 可给 0.4~0.6；"
+        "<br>- 若基本上中级，偶有高级 → 可给 0.6~0.8；"
+        "<br>- 若以中高级提问为主，且层次分明 → 可给 0.8~1.0。"
+
+    )
+}
+
+
+def _ranking_from_book(book, poid, dim, model_keys, model_names):
+    """评分簿中的偏好名次换回排序控件的取值（从高到低的模型名列表）；未排序返回空列表。"""
+    ranks = {m: book.get("part1", poid, "", dim, m, 0) for m in model_keys}  # {"A":3, "C":2, "B":1}
+    if not any(ranks.values()):
+        return []
+    return [model_names[model_keys.index(m)] for m, _ in sorted(ranks.items(), key=lambda x: -x[1])]
+
+
+@metrics.timed("render_part1_scoring")
 def render_part1_scoring(poid: str):
     teacher_id = st.session_state.teacher_id
     model_names = ["模型1", "模型2", "模型3"]
     model_map = st.session_state.model_shuffle_map[st.session_state.page]
     model_keys = [model_map[str(i)] for i in range(1, 4)]
 
-    dimensions = {
-        "整体偏好排序（主观倾向）": "rank",
-        "最终答案正确": "radio",
-        "过程正确": "slider_float",
-        "提问质量": "slider_float",
-        "语言流畅度": "slider_int",
-        "是否指出知识点": "radio",
-        "知识点内容是否正确": "radio",
-        "是否分步讲解": "radio"
-
-    }
-
-    descriptions = {
-        "整体偏好排序（主观倾向）": (
-            "📌 阅读以上三个模型的答疑对话后，假设你需要从中选择一个用于实际学生答疑。"
-            "<br><b>请根据主观判断，对三个模型在该问题上的表现进行偏好排序</b>（排在前面的表示你最倾向选择的模型）。"
-            "<br><b>参考维度：</b>讲解内容是否合适、方法是否符合教学、语言是否易懂等。"
-        ),
-        "语言流畅度": (
-            "📌 请为上面对话中模型的语言流畅度打分。"
-            "<br><b>满分（10）标准：</b>语言符合语法、表达简洁准确、清晰易懂，沟通过程中不显得重复或冗长。"
-            "<br>⚠️ 注意：若模型表达虽准确但较为啰嗦，建议扣除部分分数。"
-
-        ),
-        "是否指出知识点": (
-            "📌 模型是否明显告知了该题涉及的知识点，比如“这个题目主要考察...”等表述，<b>且知识点正确</b>。"
-            "<br><b>选择 1 表示有明确指出，0 表示没有。</b>"
-        ),
-        "知识点内容是否正确": (
-            "📌 判断对话中提及的知识点、概念描述是否<b>都是正确的</b>。"
-            "<br><b>是：1，否：0。</b>"
-        ),
-        "最终答案正确": (
-            "📌 判断模型是否给出了<b>最终答案</b>，以及该答案是否<b>正确</b>。"
-            "<br>如果问题是多小问的，那么最后一小问的答案视为<b>最终答案</b>。"
-            "<br>如果对话还没有推进到最终答案阶段就结束了，<b>视为未给出答案：0</b>。"
-            "<br><b>正确：1，不正确或未给出：0。</b>"
-        ),
-        "过程正确": (
-            "📌 判断模型在逐步讲解过程中，<b>正确部分占比</b>是多少。"
-            "<br>例如："
-            "<br>- 正确了一半 → 分数 0.5；"
-            "<br>- 正确两个小问中的一个 → 分数 0.5；"
-            "<br>- 全过程正确但结尾错误 → 分数 0.9。"
-        ),
-        "是否分步讲解": (
-            "📌 判断模型是否<b>遵循分步骤</b>进行讲解，即每轮引导学生推进一步，而不是一股脑输出全部回答。"
-            "<br><b>是：1，否（直接给结果或存在跳跃性推导）：0。</b>"
-        ),
-        "提问质量": (
-            "📌 判断模型在讲解过程中提出的<b>高质量问题比例</b>："
-            "<br>请参考以下提问分级标准，判断模型在对话中是否提出了促进学生深入思考的问题，并据此评估其高质量提问所占的比例（0~1）："
-            "<br>（1）<b>低级提问</b> - 仅为确认或重复"
-            "<br>  典型方式：如“你明白了吗？”“你记住了吗？”"
-            "<br>（2）<b>中等提问</b> - 促使学生进行操作或尝试"
-            "<br>  典型方式：如“你能试着算一下这个表达式吗？”“请你告诉我这个式子的结果是多少。”"
-            "<br>（3）<b>高级提问</b> - 引导学生进行分析、推理、评价或创造"
-            "<br>  引导下一步：如“我们已经知道……，下一步该怎么做？”“根据现在的条件，你能得出什么结论？”"
-            "<br>  评价/创造类：如“这个题有没有其他解法？”“你能设计一个类似的问题吗？”"
-            "<br><br><b>评分建议：</b>"
-            "<br>- 若对话中基本没有提问，或只有少量低级提问 → 可给 0.0~0.3；"
-            "<br>- 若基本上低级，偶有中级 → 可给 0.4~0.6；"
-            "<br>- 若基本上中级，偶有高级 → 可给 0.6~0.8；"
-            "<br>- 若以中高级提问为主，且层次分明 → 可给 0.8~1.0。"
+    dimensions = PART1_CONTROLS
+    descriptions = PART1_DESCRIPTIONS
 
-        )
-    }
-
-    scores = st.session_state.all_scores[teacher_id].setdefault("part1_scores", {})
+    book = st.session_state.all_scores[teacher_id]
     part1_key = f"part1_{poid}"
-    scores.setdefault(part1_key, {})
 
     render_latex_textblock("###### 请根据对话内容，根据下列维度评分：")
 
     for i, (dim, control_type) in enumerate(dimensions.items(), start=1):
-        scores[part1_key].setdefault(dim, {})  # 防止 KeyError
-
         with st.expander(f"（{i}）{dim}", expanded=False):
-            st.markdown(f"<div style='font-size: 16px; padding-left: 1em;'>{descriptions[dim]}</div>", unsafe_allow_html=True)
+            markdown(f"<div style='font-size: 16px; padding-left: 1em;'>{descriptions[dim]}</div>", unsafe_allow_html=True)
 
             if control_type == "rank":
                 multiselect_key = f"{part1_key}_{dim}_multiselect"  # 加上维度和 poid，确保唯一性
 
                 # ===== 初始化 session_state（首次访问该样本时才初始化） =====
                 if multiselect_key not in st.session_state:
-                    prev_ranks = scores[part1_key].get(dim, {})  # {"A":3, "C":2, "B":1}
-                    if any(prev_ranks.values()):
-                        # 有打分，恢复排序顺序
-                        ranked_models = sorted(prev_ranks.items(), key=lambda x: -x[1])
-                        restored = []
-                        for rk, _ in ranked_models:
-                            if rk in model_keys:
-                                idx = model_keys.index(rk)
-                                restored.append(model_names[idx])
-                        st.session_state[multiselect_key] = restored
-                    else:
-                        st.session_state[multiselect_key] = []  # ✅ 没填过，显式设为空（防止复用前页的值）
+                    # 没填过时显式设为空（防止复用前页的值）
+                    st.session_state[multiselect_key] = _ranking_from_book(book, poid, dim, model_keys, model_names)
 
                 # ===== 渲染 multiselect，使用 key 保留顺序 =====
                 selected = st.multiselect(
@@ -318,14 +356,13 @@ def render_part1_scoring(poid: str):
                 if len(selected) == 3:
                     for idx, mname in enumerate(selected):
                         model_idx = model_names.index(mname)
-                        scores[part1_key][dim][model_keys[model_idx]] = 3 - idx
-                    if "filled_poids_with_rank" not in st.session_state:
-                        st.session_state.filled_poids_with_rank = set()
-                    st.session_state.filled_poids_with_rank.add(poid)
+                        book.set("part1", poid, "", dim, model_keys[model_idx], 3 - idx)
                 else:
                     for i in range(3):
-                        scores[part1_key][dim][model_keys[i]] = 0
+                        book.set("part1", poid, "", dim, model_keys[i], 0)
                     st.warning("请完成模型偏好排序（需要选满三个）以保存评分结果。", icon="⚠️")
+                # 选了但没选满：控件里的排序没有进评分簿
+                mark_dirty(poid, "part1", selected != _ranking_from_book(book, poid, dim, model_keys, model_names))
 
                 continue
 
@@ -336,26 +373,26 @@ def render_part1_scoring(poid: str):
             cols = st.columns([1, 0.05, 1, 0.05, 1])
             for j, (col, model_name) in enumerate(zip([cols[0], cols[2], cols[4]], model_names)):
                 key = f"{part1_key}_{dim}_{model_name}"
-                prev_value = scores[part1_key][dim].get(model_keys[j], 0)
+                prev_value = book.get("part1", poid, "", dim, model_keys[j], 0)
 
                 with col:
-                    st.markdown(
+                    markdown(
                         f"<div style='text-align: center; padding-top: 0.5rem; font-weight: bold;'>{model_name}</div>",
                         unsafe_allow_html=True
                     )
                     if control_type == "slider_int":
-                        st.markdown("<style>div[data-baseweb='slider'] { max-width: 130px; }</style>", unsafe_allow_html=True)
+                        markdown("<style>div[data-baseweb='slider'] { max-width: 130px; }</style>", unsafe_allow_html=True)
                         val = st.slider("", 0, 10, int(prev_value), step=1, key=key)
                     elif control_type == "slider_float":
-                        st.markdown("<style>div[data-baseweb='slider'] { max-width: 130px; }</style>", unsafe_allow_html=True)
+                        markdown("<style>div[data-baseweb='slider'] { max-width: 130px; }</style>", unsafe_allow_html=True)
                         val = st.slider("", 0.0, 1.0, float(prev_value), step=0.1, key=key)
                     elif control_type == "radio":
-                        st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
+                        markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
                         val = st.radio("", [0, 1], index=int(prev_value), horizontal=True, key=key)
-                        st.markdown("</div>", unsafe_allow_html=True)
+                        markdown("</div>", unsafe_allow_html=True)
                     else:
                         val = 0
-                    scores[part1_key][dim][model_keys[j]] = val
+                    book.set("part1", poid, "", dim, model_keys[j], val)
 
             with cols[1]:
                 render_vertical_divider()
@@ -363,7 +400,113 @@ def render_part1_scoring(poid: str):
                 render_vertical_divider()
 
 
-def render_part2_scoring(part2_list, poid):
+# ========== part1 紧凑评分表格 ==========
+# 经典布局每个维度一个 expander，里面再套列、滑块样式和三个控件，一次重跑要发出几十个元素。
+# 紧凑布局把“模型 × 维度”整张矩阵（含偏好名次）放进一个 st.data_editor，
+# 一次提交就拿到全部分值。名次列填 1~3（1 为最偏好），存储时换算成与排序控件相同的 3/2/1。
+GRID_RANK_COLUMN = "偏好名次"
+
+
+def _plain_description(html: str) -> str:
+    return re.sub(r"<[^>]+>", "", html.replace("<br>", "\n"))
+
+
+def _grid_column_config():
+    config = {}
+    for dim, control_type in PART1_CONTROLS.items():
+        help_text = _plain_description(PART1_DESCRIPTIONS[dim])
+        if control_type == "rank":
+            config[GRID_RANK_COLUMN] = st.column_config.NumberColumn(
+                GRID_RANK_COLUMN, help=help_text, min_value=1, max_value=3, step=1, format="%d")
+        elif control_type == "radio":
+            config[dim] = st.column_config.CheckboxColumn(dim, help=help_text)
+        elif control_type == "slider_float":
+            config[dim] = st.column_config.NumberColumn(
+                dim, help=help_text, min_value=0.0, max_value=1.0, step=0.1, format="%.1f")
+        elif control_type == "slider_int":
+            config[dim] = st.column_config.NumberColumn(
+                dim, help=help_text, min_value=0, max_value=10, step=1, format="%d")
+    return config
+
+
+def _grid_base(book, poid, model_keys, model_names):
+    rows = []
+    for key in model_keys:
+        row = {}
+        for dim, control_type in PART1_CONTROLS.items():
+            value = book.get("part1", poid, "", dim, key, 0)
+            if control_type == "rank":
+                row[GRID_RANK_COLUMN] = 4 - int(value) if value else None
+            elif control_type == "radio":
+                row[dim] = bool(value)
+            elif control_type == "slider_int":
+                row[dim] = int(value)
+            else:
+                row[dim] = float(value)
+        rows.append(row)
+    return pd.DataFrame(rows, index=pd.Index(model_names, name="模型"))
+
+
+@metrics.timed("render_part1_grid")
+def render_part1_grid(poid: str):
+    teacher_id = st.session_state.teacher_id
+    model_names = ["模型1", "模型2", "模型3"]
+    model_map = st.session_state.model_shuffle_map[st.session_state.page]
+    model_keys = [model_map[str(i)] for i in range(1, 4)]
+
+    book = st.session_state.all_scores[teacher_id]
+    grid_key = f"part1_{poid}_grid"
+    base_key = f"{grid_key}_base"
+
+    # 表格的编辑状态以首次渲染时的数据为基准，同一样本内保持不变；
+    # 切回经典布局再回来时（表格状态已被回收）按评分簿重新生成
+    if grid_key not in st.session_state or base_key not in st.session_state:
+        st.session_state[base_key] = _grid_base(book, poid, model_keys, model_names)
+
+    render_latex_textblock("###### 请根据对话内容，在表格中为三个模型评分：")
+    with st.expander("📖 评分说明", expanded=False):
+        for i, dim in enumerate(PART1_CONTROLS, start=1):
+            markdown(f"**（{i}）{dim}**<br>{PART1_DESCRIPTIONS[dim]}", unsafe_allow_html=True)
+
+    edited = st.data_editor(
+        st.session_state[base_key],
+        key=grid_key,
+        column_config=_grid_column_config(),
+        num_rows="fixed",
+        use_container_width=True,
+    )
+
+    for dim, control_type in PART1_CONTROLS.items():
+        if control_type == "rank":
+            continue
+        for j, key in enumerate(model_keys):
+            value = edited[dim].iloc[j]
+            if control_type == "radio":
+                value = int(bool(value))
+            elif control_type == "slider_int":
+                value = 0 if pd.isna(value) else int(value)
+            else:
+                value = 0.0 if pd.isna(value) else round(float(value), 1)
+            book.set("part1", poid, "", dim, key, value)
+
+    # 名次必须恰好是 1、2、3 各一次，否则视为未完成排序
+    places = [None if pd.isna(v) else int(v) for v in edited[GRID_RANK_COLUMN]]
+    if sorted(p for p in places if p is not None) == [1, 2, 3]:
+        for j, key in enumerate(model_keys):
+            book.set("part1", poid, "", RANK_DIMENSION, key, 4 - places[j])
+    else:
+        for key in model_keys:
+            book.set("part1", poid, "", RANK_DIMENSION, key, 0)
+        if any(p is not None for p in places):
+            st.warning("偏好名次需为 1、2、3 各填一次（1 为最偏好），当前排序未保存。", icon="⚠️")
+        else:
+            st.warning("请在“偏好名次”列为三个模型排序以保存评分结果。", icon="⚠️")
+    saved = [book.get("part1", poid, "", RANK_DIMENSION, key, 0) for key in model_keys]
+    mark_dirty(poid, "part1", places != [4 - int(v) if v else None for v in saved])
+
+
+@metrics.timed("render_part2_scoring")
+def render_part2_scoring(part2_list, poid, block_idx):
     teacher_id = st.session_state.teacher_id
     model_names = ["模型1", "模型2", "模型3"]
     model_map = st.session_state.model_shuffle_map[st.session_state.page]
@@ -405,43 +548,42 @@ def render_part2_scoring(part2_list, poid):
 
     }
 
-    scores = st.session_state.all_scores[teacher_id].setdefault("part2_scores", {})
+    book = st.session_state.all_scores[teacher_id]
 
     for idx, block in enumerate(part2_list):
         block_type = block["type"]
         label = type_map[block_type]
-        block_key = f"part2_{poid}_t{block_type}_{idx}"
+        block_key = f"part2_{poid}_idx{block_idx}_t{block_type}_{idx}"
 
         # === 标题（编号） ===
-        st.markdown(f"<div style='font-size:18px; font-weight: bold;'>（{block_type}） {label}</div>", unsafe_allow_html=True)
+        markdown(f"<div style='font-size:18px; font-weight: bold;'>（{block_type}） {label}</div>", unsafe_allow_html=True)
 
         # === 描述（加大字体 + 缩进） ===
-        st.markdown(f"<div style='font-size: 16px; padding-left: 1em;'>{description_map.get(label, '')}</div>", unsafe_allow_html=True)
+        markdown(f"<div style='font-size: 16px; padding-left: 1em;'>{description_map.get(label, '')}</div>", unsafe_allow_html=True)
 
 
         # === 布局：带分割线 ===
         cols = st.columns([1, 0.05, 1, 0.05, 1])
-        scores.setdefault(block_key, {})
 
         for i, (col, model_name) in enumerate(zip([cols[0], cols[2], cols[4]], model_names)):
             key = f"{block_key}_{model_name}"
-            prev_value = scores[block_key].get(model_keys[i], type_options[block_type][0])
+            prev_value = book.get("part2", poid, block_idx, block_type, model_keys[i], type_options[block_type][0])
 
             with col:
                 subcol1, subcol2 = st.columns([1, 2])
                 with subcol1:
-                    st.markdown(
+                    markdown(
                         f"<div style='text-align: center; padding-top: 0.3rem; font-weight: bold;'>{model_name}</div>",
                         unsafe_allow_html=True
                     )
                 with subcol2:
-                    st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
+                    markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
                     val = st.radio("", type_options[block_type],
                                    index=type_options[block_type].index(prev_value),
                                    horizontal=True, key=key)
-                    st.markdown("</div>", unsafe_allow_html=True)
+                    markdown("</div>", unsafe_allow_html=True)
 
-            scores[block_key][model_keys[i]] = val
+            book.set("part2", poid, block_idx, block_type, model_keys[i], val)
 
         # === 插入分隔竖线 ===
         with cols[1]:
@@ -450,13 +592,14 @@ def render_part2_scoring(part2_list, poid):
             render_vertical_divider()
 
 
+@metrics.timed("render_part3_scoring")
 def render_part3_scoring(item, poid):
     teacher_id = st.session_state.teacher_id
     model_names = ["模型1", "模型2", "模型3"]
     model_map = st.session_state.model_shuffle_map[st.session_state.page]
     model_keys = [model_map[str(i)] for i in range(1, 4)]
 
-    scores = st.session_state.all_scores[teacher_id].setdefault("part3_scores", {})
+    book = st.session_state.all_scores[teacher_id]
 
     type_labels_map = {
         "correct": [
@@ -494,36 +637,35 @@ def render_part3_scoring(item, poid):
         score_key = f"part3_{poid}_{item['question_id']}_score{score_type}"
 
         # === 维度标题加编号 ===
-        st.markdown(f"<div style='font-size: 18px; font-weight: bold;'>（{score_type + 1}） {label}</div>", unsafe_allow_html=True)
+        markdown(f"<div style='font-size: 18px; font-weight: bold;'>（{score_type + 1}） {label}</div>", unsafe_allow_html=True)
 
         # === 描述文字样式优化 ===
-        st.markdown(f"<div style='font-size: 16px; padding-left: 1em;'>{desc}</div>", unsafe_allow_html=True)
+        markdown(f"<div style='font-size: 16px; padding-left: 1em;'>{desc}</div>", unsafe_allow_html=True)
 
 
-        st.markdown("<div style='height: 10px;'></div>", unsafe_allow_html=True)
+        markdown("<div style='height: 10px;'></div>", unsafe_allow_html=True)
 
         # === 模型评分：三栏分隔 + 竖线 ===
         cols = st.columns([1, 0.05, 1, 0.05, 1])
-        scores.setdefault(score_key, {})
 
         for i, (col, model_name) in enumerate(zip([cols[0], cols[2], cols[4]], model_names)):
             key = f"{score_key}_{model_name}"
-            prev_value = scores[score_key].get(model_keys[i], 0)
+            prev_value = book.get("part3", poid, item["question_id"], score_type, model_keys[i], 0)
 
             with col:
                 subcol1, subcol2 = st.columns([1, 2])
                 with subcol1:
-                    st.markdown(
+                    markdown(
                         f"<div style='text-align: center; padding-top: 0.3rem; font-weight: bold;'>{model_name}</div>",
                         unsafe_allow_html=True
                     )
                 with subcol2:
-                    st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
+                    markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
                     val = st.radio("", [0, 1],
                                    index=int(prev_value), horizontal=True, key=key)
-                    st.markdown("</div>", unsafe_allow_html=True)
+                    markdown("</div>", unsafe_allow_html=True)
 
-            scores[score_key][model_keys[i]] = val
+            book.set("part3", poid, item["question_id"], score_type, model_keys[i], val)
 
         # === 插入分隔竖线 ===
         with cols[1]:
@@ -535,27 +677,203 @@ def render_part3_scoring(item, poid):
 
 
 
+# ========== 表单提交模式 ==========
+# 开启后每个 part 的评分控件放进一个表单，改动不会触发重跑，点击“保存”后一次性提交，
+# 每条样本的重跑次数从几十次降到 3 次左右。
+# 翻页前的未保存检查：表单内尚未提交的改动不会传到服务端，服务端能比较的只有“已提交的控件值”
+# 和评分簿。评分簿里已有的分值（包括刷新后从评分库恢复的）都算已保存；评分控件渲染时把
+# 控件值与评分簿不一致的 part 记为未保存（例如偏好排序没选满三个、表格名次不是 1/2/3 各一次），
+# 翻页时提示，在同一页、同样的未保存内容下再次点击同一目标才离开。
+PART_TITLES = {"part1": "Part 1", "part2": "Part 2", "part3": "Part 3"}
+
+_SCORING_FRAGMENTS = {
+    func.__name__: st.fragment(func)
+    for func in (render_part1_scoring, render_part1_grid, render_part2_scoring, render_part3_scoring)
+}
+
+
+def form_mode():
+    return st.session_state.get("form_mode", False)
+
+
+def grid_mode():
+    return st.session_state.get("grid_mode", False)
+
+
+def scoring_panel(func):
+    """表单模式下直接调用（由表单统一提交）；否则作为独立重跑的 fragment。"""
+    return func if form_mode() else _SCORING_FRAGMENTS[func.__name__]
+
+
+@contextmanager
+def part_form(part, poid):
+    if not form_mode():
+        yield
+        return
+    with st.form(key=f"form_{part}_{poid}"):
+        yield
+        if st.form_submit_button(f"💾 保存 {PART_TITLES[part]} 评分"):
+            st.toast(f"{PART_TITLES[part]} 评分已保存", icon="✅")
+
+
+def mark_dirty(poid, part, dirty):
+    """评分控件渲染后调用：控件值与评分簿不一致时记为未保存。"""
+    dirty_parts = st.session_state.setdefault("dirty_parts", set())
+    if dirty:
+        dirty_parts.add((poid, part))
+    else:
+        dirty_parts.discard((poid, part))
+
+
+def unsaved_parts(poid):
+    if not form_mode():
+        return []
+    dirty_parts = st.session_state.get("dirty_parts", set())
+    return [part for part in PART_TITLES if (poid, part) in dirty_parts]
+
+
+def go_to_page(target, poid):
+    """翻页；表单模式下本页有未保存的 part 时先提示，再次点击同一目标才离开。"""
+    unsaved = unsaved_parts(poid)
+    # 确认只对提示时的页面和未保存内容有效
+    pending = (st.session_state.page, target, tuple(unsaved))
+    if unsaved and st.session_state.get("pending_nav") != pending:
+        st.session_state.pending_nav = pending
+        names = "、".join(PART_TITLES[p] for p in unsaved)
+        st.session_state.nav_warning = f"本页 {names} 的评分与已保存的不一致（如偏好排序未完成），离开后这些改动会丢失。再次点击即可直接离开。"
+        return
+    st.session_state.pending_nav = None
+    st.session_state.page = target
+    st.rerun()
+
+
+# ========== 教师ID映射表（前端展示ID -> 实际文件ID） ==========
+ID_MAPPING = {
+    "T000": "T000",
+    "T7900": "T001",
+    "T2698": "T002",
+    "T8347": "T003",
+    "T7567": "T004",
+    "T2131": "T005",
+    "T6286": "T006"
+}
+
+
+# ========== 管理员页面 ==========
+# 管理员编号由环境变量 EVAL_ADMIN_IDS 指定（逗号分隔），没有默认值：未设置时不开放管理员页面
+ADMIN_IDS = {i.strip() for i in os.environ.get("EVAL_ADMIN_IDS", "").split(",") if i.strip()}
+
+
+STALL_MINUTES = 30  # 未完成且超过这么久没有新的评分，视为停滞
+MIN_RATE_HOURS = 0.25  # 计算“平均每小时”时的最短时间窗，刚开始评估时不至于算出每小时几千条
+
+
+def hourly_rate(completed, first_activity, last_activity):
+    """首次到最近一次活动之间平均每小时完成的样本数；时间窗不足 MIN_RATE_HOURS 时按 MIN_RATE_HOURS 计。"""
+    active_hours = max((last_activity - first_activity) / 3600, MIN_RATE_HOURS)
+    return round(completed / active_hours, 1)
+
+
+def render_progress_table():
+    # 进度汇总由评分库在写入时增量维护，这里只读每位教师一行 + 近 1 小时完成数
+    now = datetime.now().timestamp()
+    progress = score_store.get_store().load_progress(since=now - 3600)
+
+    rows = []
+    for display_id, teacher_id in ID_MAPPING.items():
+        try:
+            total = len(data_store.load_dataset(f"data_{teacher_id}.json"))
+        except FileNotFoundError:
+            total = None
+        p = progress.get(teacher_id)
+        if p is None:
+            status, completed = "未开始", 0
+        else:
+            completed = p["completed"]
+            idle_minutes = (now - p["last_activity"]) / 60
+            if total is not None and completed >= total:
+                status = "已完成"
+            elif idle_minutes > STALL_MINUTES:
+                status = f"⚠️ 停滞（{idle_minutes:.0f} 分钟无操作）"
+            else:
+                status = "进行中"
+        rows.append({
+            "教师编号": display_id,
+            "数据文件": teacher_id,
+            "已完成": completed,
+            "样本总数": total,
+            "完成率": f"{completed / total:.0%}" if total else "-",
+            "已打开": p["opened"] if p else 0,
+            "近1小时完成": p["recent"] if p else 0,
+            "平均每小时": hourly_rate(completed, p["first_activity"], p["last_activity"]) if p else None,
+            "最近活动": datetime.fromtimestamp(p["last_activity"]).strftime("%m-%d %H:%M") if p else "-",
+            "状态": status,
+        })
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
+def render_admin_page():
+    st.title("🛠️ 管理员页面")
+
+    markdown("#### 📈 评估进度")
+    render_progress_table()
+
+    markdown("#### 🏆 模型偏好排行（Bradley–Terry，基于整体偏好排序）")
+    # 排行榜常驻进程内，每次刷新只读取上次之后有新评分的样本
+    leaderboard = ranking.get_leaderboard(score_store.get_store().db_path)
+    score_store.get_store().flush()
+    leaderboard.refresh()
+    board = leaderboard.board
+    if board.comparisons():
+        st.caption(f"共 {board.comparisons()} 次两两比较；各教师列为该教师评分单独拟合的强度（几何平均为 1）")
+        st.dataframe(board.table(), use_container_width=True, hide_index=True)
+    else:
+        st.info("尚无完整的偏好排序。")
+
+    markdown("#### ⏱️ 热路径耗时（毫秒；markdown_bytes 指标单位为字节）")
+    snapshot = metrics.snapshot()
+    if snapshot:
+        st.dataframe(
+            [{"指标": name, **{k: (round(v, 2) if isinstance(v, float) else v) for k, v in m.items()}}
+             for name, m in snapshot.items()],
+            use_container_width=True,
+        )
+    else:
+        st.info("尚无计时数据。")
+
+    markdown("#### 🗃️ 缓存状态")
+    st.json({"data_store": data_store.cache_stats(), "render_cache": render_cache.cache_stats()})
+
+    col1, col2, _ = st.columns([1, 1, 3])
+    with col1:
+        if st.button("导出指标到本地文件"):
+            path = f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            metrics.dump(path, {"data_store": data_store.cache_stats(), "render_cache": render_cache.cache_stats()})
+            st.success(f"已写入 {os.path.abspath(path)}")
+    with col2:
+        if st.button("退出管理员页面"):
+            del st.session_state.is_admin
+            st.rerun()
+
+
 # ========== 主程序入口 ==========
 def main():
 
-    # 教师ID映射表（前端展示ID -> 实际文件ID）
-    ID_MAPPING = {
-        "T000": "T000",
-        "T7900": "T001",
-        "T2698": "T002",
-        "T8347": "T003",
-        "T7567": "T004",
-        "T2131": "T005",
-        "T6286": "T006"
-    }
+    if st.session_state.get("is_admin"):
+        render_admin_page()
+        return
+
     # ========== 入口页：教师编号输入 ==========
     if "teacher_id" not in st.session_state:
         st.title("智能答疑教师评估系统")
-        st.markdown("请输入您的教师编号：")
+        markdown("请输入您的教师编号：")
         teacher_input = st.text_input("教师编号", "")
         if st.button("开始评估") and teacher_input.strip():
             input_id = teacher_input.strip()
-            if input_id in ID_MAPPING:
+            if input_id in ADMIN_IDS:
+                st.session_state.is_admin = True
+                st.rerun()
+            elif input_id in ID_MAPPING:
                 st.session_state.teacher_id = ID_MAPPING[input_id]
                 st.session_state.display_id = input_id
                 st.rerun()
@@ -570,23 +888,22 @@ def main():
     if "all_scores" not in st.session_state:
         st.session_state.all_scores = {}
 
-    # 初始化当前教师的评分记录（隔离）
+    # 初始化当前教师的评分记录（隔离），从评分库恢复此前保存的结果
+    # all_scores[teacher_id] 是 score_model.ScoreBook，修改会自动写回评分库
     if teacher_id not in st.session_state.all_scores:
-        st.session_state.all_scores[teacher_id] = {
-            "part1_scores": {},
-            "part2_scores": {},
-            "part3_scores": {}
-        }
+        st.session_state.all_scores[teacher_id] = score_store.get_store().load_book(teacher_id)
 
     # ========== 加载数据：每位教师一个 JSON ==========
     file_path = f"data_{teacher_id}.json"
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # 构建 poid 到 index 的映射，用于导出时显示“第 x / y 条”
-            poid_to_index_map = {sample["poid"]: i for i, sample in enumerate(data)}
-            st.session_state.poid_to_index_map = poid_to_index_map
-            st.session_state.total_pages = len(data)
+        # 进程级缓存：所有会话共享样本库和 poid 索引，文件更新后自动重新加载（只读，不要修改）
+        # data[idx] 只解码当前这一条样本
+        with metrics.span("data_load"):
+            data = data_store.load_dataset(file_path)
+            # 离线预渲染的公式表（prerender_math.py 生成，没有时页面照常发送原始 TeX）
+            render_cache.load_math_table(file_path)
+        st.session_state.poid_to_index_map = data.poid_to_index
+        st.session_state.total_pages = len(data)
 
     except FileNotFoundError:
         st.error(f"未找到编号 {teacher_id} 对应的数据文件：`{file_path}`。请联系管理员。")
@@ -602,26 +919,36 @@ def main():
     if "results" not in st.session_state:
         st.session_state.results = {}
 
+    # 表单提交模式（侧边栏开关）
+    st.sidebar.toggle("📝 表单提交模式", key="form_mode",
+                      help="开启后每个部分的评分改为点击“保存”后一次性提交，减少页面重跑次数")
+    st.sidebar.toggle("🧮 Part 1 紧凑评分表格", key="grid_mode",
+                      help="把 Part 1 的全部评分维度放进一张表格，页面元素更少、重跑更快")
+
+    # 每个会话一份预取缓存（有内存上限），翻页时优先从这里取样本
+    if "prefetch_cache" not in st.session_state:
+        st.session_state.prefetch_cache = prefetch.PrefetchCache()
+    prefetch_cache = st.session_state.prefetch_cache
+
     idx = st.session_state.page
-    current = data[idx]
+    # 换页后（包括登录恢复等不经过 go_to_page 的情况）之前的离开确认作废
+    pending_nav = st.session_state.get("pending_nav")
+    if pending_nav is not None and pending_nav[0] != idx:
+        st.session_state.pending_nav = None
+    with metrics.span("sample_load"):
+        current = prefetch_cache.get(data, idx)
     poid = current.get("poid", f"id_{idx}")
+    sample_key = prefetch.sample_key(data, idx)  # 渲染缓存中对话面板的位置键，与预取时一致
 
     # 初始化模型顺序混淆
-    if "model_shuffle_map" not in st.session_state:
-        st.session_state.model_shuffle_map = {}
-
-    if idx not in st.session_state.model_shuffle_map:
-        shuffled = ["A", "B", "C"]
-        random.shuffle(shuffled)
-        st.session_state.model_shuffle_map[idx] = dict(zip(["1", "2", "3"], shuffled))
+    ensure_model_shuffle(idx)
 
 
     # 页面导航（顶部 + 跳转）
     col1, col2, col3 = st.columns([1, 2, 1])
     with col1:
         if st.button("上一条", key="top_prev") and idx > 0:
-            st.session_state.page -= 1
-            st.rerun()
+            go_to_page(idx - 1, poid)
 
     with col2:
         sub_col1, sub_col2, sub_col3 = st.columns([1, 3, 2])
@@ -630,139 +957,57 @@ def main():
                 jump_page = st.number_input("跳转到第几条（从 1 开始）", min_value=1, max_value=total_pages, value=idx + 1, step=1, key="jump_input")
                 submitted = st.form_submit_button("跳转")
                 if submitted:
-                    st.session_state.page = jump_page - 1
-                    st.rerun()
+                    go_to_page(jump_page - 1, poid)
 
     with col3:
         if st.button("下一条", key="top_next") and idx < total_pages - 1:
-            st.session_state.page += 1
-            st.rerun()
+            go_to_page(idx + 1, poid)
+
+    nav_warning = st.session_state.pop("nav_warning", None)
+    if nav_warning:
+        st.warning(nav_warning, icon="⚠️")
 
 
     # ========== 展示任务内容 ==========
-    st.markdown(f"### 第 {idx + 1} / {total_pages} 条样本")
-    st.markdown(f"**样本 ID：** {poid}")
+    markdown(f"### 第 {idx + 1} / {total_pages} 条样本")
+    markdown(f"**样本 ID：** {poid}")
+
+    with metrics.span("display_part1"):
+        display_part1(current["content"]["part1"], poid, sample_key)
+    with metrics.span("display_part2"):
+        display_part2(current["content"]["part2"], poid, sample_key)
+    with metrics.span("display_part3"):
+        display_part3(current["content"]["part3"], poid)
 
-    display_part1(current["content"]["part1"], poid)
-    display_part2(current["content"]["part2"], poid)
-    display_part3(current["content"]["part3"], poid)
+    # 页面内容已发出，后台预取上一条 / 下一条并提前拼好页面片段
+    # （跳转表单的输入值在提交前不会传到服务端，跳转后会预取新位置的相邻样本）
+    neighbours = [i for i in (idx + 1, idx - 1) if 0 <= i < total_pages]
+    prefetch_cache.schedule(data, [(i, ensure_model_shuffle(i)) for i in neighbours], prerender_sample)
 
 
     # ========== 导出按钮 ==========
+    export_col1, _ = st.columns([1, 3])
+    with export_col1:
+        export_format = st.selectbox("导出格式", list(export_scores.FORMATS), key="export_format")
     if st.button("导出所有评分结果"):
-        teacher_scores = st.session_state.all_scores.get(teacher_id, {})
-        all_scores = []
-        exported_poids = set()
-
-        real_keys = {"A": "DeepSeek-V3", "B": "o4-mini", "C": "Spark_X1"}
-        poid_to_index_map = st.session_state.poid_to_index_map
-        total_pages = st.session_state.total_pages
-        filled_poids = st.session_state.get("filled_poids_with_rank", set())
-
-        # ==== Part1 ====
-        for k, v in teacher_scores.get("part1_scores", {}).items():
-            poid = k.replace("part1_", "")
-            if poid not in filled_poids:
-                continue
-            sample_index = poid_to_index_map.get(poid, -1)
-
-            for dim, models in v.items():
-                if dim not in ["语言流畅度", "是否指出知识点", "知识点内容是否正确",
-                            "最终答案正确", "过程正确", "是否分步讲解", "提问质量",
-                            "整体偏好排序（主观倾向）"]:
-                    continue
-                row = {
-                    "poid": poid,
-                    "sample_index_display": f"{sample_index + 1} / {total_pages}",
-                    "part": "part1",
-                    "type": dim,
-                    "dimension": dim,
-                    "score_DeepSeek-V3": models.get("A", ""),
-                    "score_o4-mini": models.get("B", ""),
-                    "score_Spark_X1": models.get("C", "")
-                }
-                all_scores.append(row)
-
-            exported_poids.add(poid)
-
-        # ==== Part2 ====
-        type_map = {
-            "1": "引导质量（理解）",
-            "2": "引导质量（不理解）",
-            "3": "导正话题"
-        }
-
-        for k, v in teacher_scores.get("part2_scores", {}).items():
-            part_match = re.match(r"part2_(.*?)_t(\d)_(\d+)", k)
-            if part_match:
-                poid_raw, tval, block_idx = part_match.groups()
-                poid_clean = poid_raw.split("_")[0]
-                if poid_clean not in exported_poids:
-                    continue
-                sample_index = poid_to_index_map.get(poid_clean, -1)
-                label = f"{type_map.get(tval, '未知类型')}_block{block_idx}"
-                row = {
-                    "poid": poid_clean,
-                    "sample_index_display": f"{sample_index + 1} / {total_pages}",
-                    "part": "part2",
-                    "type": label,
-                    "dimension": type_map.get(tval, "未知类型"),
-                    "score_DeepSeek-V3": v.get("A", ""),
-                    "score_o4-mini": v.get("B", ""),
-                    "score_Spark_X1": v.get("C", "")
-                }
-                all_scores.append(row)
-
-        # ==== Part3 ====
-        type_labels_map = {
-            "correct": ["正确理解", "正确反馈"],
-            "error": ["正确理解", "正确反馈"],
-            "question": ["正确理解", "正确反馈"]
-        }
-
-        for k, v in teacher_scores.get("part3_scores", {}).items():
-            part_match = re.match(r"part3_(.*?)_(.*?)_score(\d)", k)
-            if part_match:
-                poid, qid, score_type = part_match.groups()
-                if poid not in exported_poids:
-                    continue
-                score_idx = int(score_type)
-
-                q_type = "correct"
-                for sample in data:
-                    if sample.get("poid") == poid:
-                        for p3 in sample["content"].get("part3", []):
-                            if p3.get("question_id") == qid:
-                                q_type = p3.get("type", "correct")
-                                break
-
-                labels = type_labels_map.get(q_type, type_labels_map["correct"])
-                dimension_name = labels[score_idx] if score_idx < len(labels) else f"评分项{score_idx}"
-
-                sample_index = poid_to_index_map.get(poid, -1)
-                row = {
-                    "poid": poid,
-                    "sample_index_display": f"{sample_index + 1} / {total_pages}",
-                    "part": "part3",
-                    "type": q_type,
-                    "dimension": dimension_name,
-                    "score_DeepSeek-V3": v.get("A", ""),
-                    "score_o4-mini": v.get("B", ""),
-                    "score_Spark_X1": v.get("C", "")
-                }
-                all_scores.append(row)
+        rows = export_scores.iter_score_rows(st.session_state.all_scores[teacher_id], data)
+        try:
+            with metrics.span("export"):
+                export_file = export_scores.export_to_bytes(rows, export_format)
+        except ImportError:
+            st.error("导出 Parquet 需要安装 pyarrow，请改用 CSV 或 JSONL。")
+        else:
+            ext, mime = export_scores.FORMATS[export_format]
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            st.download_button(
+                "📥 点击下载评分表",
+                data=export_file,
+                file_name=f"评分结果_{teacher_id}_{timestamp}.{ext}",
+                mime=mime,
+            )
 
-        # ==== 导出文件 ====
-        df = pd.DataFrame(all_scores)
-        csv = df.to_csv(index=False, encoding="utf-8-sig")
-        b64 = base64.b64encode(csv.encode("utf-8-sig")).decode()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"评分结果_{teacher_id}_{timestamp}.csv"
-        href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">📥 点击下载评分表</a>'
-        st.markdown(href, unsafe_allow_html=True)
 
 
-    
 
 
 
@@ -770,26 +1015,28 @@ def main():
 if __name__ == "__main__":
     st.set_page_config(layout="wide")
 
-    # 样式
-    st.markdown("""
-        <style>
-            .model-box {
-                background-color: #f7f7f7;
-                border: 1px solid #ddd;
-                border-radius: 10px;
-                padding: 0.75rem 1rem;
-                margin-bottom: 0.5rem;
-            }
-        </style>
-    """, unsafe_allow_html=True)
-
-    st.markdown("""
-        <style>
-            .block-container {
-                padding-left: 2rem;
-                padding-right: 2rem;
-            }
-        </style>
-    """, unsafe_allow_html=True)
+    # 整次重跑（含样式）计入 rerun.total / rerun.markdown_bytes
+    with metrics.rerun():
+        # 样式
+        markdown("""
+            <style>
+                .model-box {
+                    background-color: #f7f7f7;
+                    border: 1px solid #ddd;
+                    border-radius: 10px;
+                    padding: 0.75rem 1rem;
+                    margin-bottom: 0.5rem;
+                }
+            </style>
+        """, unsafe_allow_html=True)
+
+        markdown("""
+            <style>
+                .block-container {
+                    padding-left: 2rem;
+                    padding-right: 2rem;
+                }
+            </style>
+        """, unsafe_allow_html=True)
 
-    main()
+        main()
@@ -0,0 +1,83 @@
+import argparse
+import timeit
+
+import data_store
+import prefetch
+import render_cache
+from app import DIALOG_INITIAL_TURNS, real_keys
+
+# ========== 渲染缓存基准 ==========
+# 对比同一片段“命中缓存”与“直接重新拼接”的耗时：缓存键的开销必须明显低于重新拼接，
+# 否则缓存只会让重跑变慢。取数据文件中最长的 part1 对话表（三个模型的前 DIALOG_INITIAL_TURNS 轮）、
+# part2 对话、单轮对话和最长的题目文本作为测试片段。
+#
+# 用法：python bench_render_cache.py --file data_T001.json --number 20000
+
+
+def longest(items, size):
+    return max(items, key=size, default=None)
+
+
+def collect(dataset):
+    """返回 [(名称, 命中缓存的调用, 重新拼接的调用)]。"""
+    tables, dialogs, texts, singles = [], [], [], []
+    names = ["模型1", "模型2", "模型3"]
+    for idx in range(len(dataset)):
+        content = dataset[idx]["content"]
+        key = prefetch.sample_key(dataset, idx)
+        part1 = content["part1"]
+        texts.append(part1["question"])
+        tables.append(([part1.get(real_keys[m], [])[:DIALOG_INITIAL_TURNS] for m in real_keys], key + ("part1", tuple(real_keys))))
+        for j, block in enumerate(content["part2"]):
+            for model in real_keys:
+                model_data = block["content"][real_keys[model]]
+                turns = model_data["dialogue"] if isinstance(model_data, dict) and "dialogue" in model_data else model_data
+                dialogs.append((turns, key + ("part2", j, model)))
+        for item in content["part3"]:
+            texts.append(item["question"])
+            singles.append((item["single_dialog"]["user"], item["single_dialog"][real_keys["A"]]))
+
+    model_turns, table_slot = longest(tables, lambda d: len(str(d[0])))
+    turns, slot = longest(dialogs, lambda d: len(str(d[0])))
+    text = longest(texts, len)
+    user_text, model_text = longest(singles, lambda s: len(s[0]) + len(s[1]))
+    return [
+        (f"part1 对话表（{len(str(model_turns))} 字符）",
+         lambda: render_cache.dialog_table(model_turns, table_slot, names, 650, skip_first_user=True),
+         lambda: render_cache.build_dialog_table(model_turns, names, 650, skip_first_user=True)),
+        (f"part2 对话（{len(str(turns))} 字符）",
+         lambda: render_cache.dialog_panel(turns, slot, "模型1", 400),
+         lambda: render_cache.build_dialog_panel(turns, "模型1", 400)),
+        (f"textblock（{len(text)} 字符）",
+         lambda: render_cache.textblock(text),
+         lambda: render_cache.build_textblock(text)),
+        (f"single（{len(user_text) + len(model_text)} 字符）",
+         lambda: render_cache.single_panel(user_text, model_text, "模型1", 250),
+         lambda: render_cache.build_single_panel(user_text, model_text, "模型1", 250)),
+    ]
+
+
+def best_us(fn, number: int, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染缓存命中 / 重新拼接耗时对比")
+    parser.add_argument("--file", type=str, nargs="+", default=["data_T001.json"], help="数据文件，可给多个")
+    parser.add_argument("--number", type=int, default=20000, help="每轮调用次数")
+    parser.add_argument("--repeat", type=int, default=7, help="轮数（取最快一轮）")
+    args = parser.parse_args()
+
+    for path in args.file:
+        dataset = data_store.load_dataset(path)
+        render_cache.load_math_table(path)
+        print(f"{path}（{len(dataset)} 条样本）")
+        for name, hit, rebuild in collect(dataset):
+            hit()  # 先放进缓存
+            hit_us = best_us(hit, args.number, args.repeat)
+            rebuild_us = best_us(rebuild, args.number, args.repeat)
+            print(f"  {name:<24} 命中 {hit_us:7.2f} µs   重新拼接 {rebuild_us:7.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+from score_tables import MODEL_NAMES, load_exports
+
+# ========== 按样本重抽样的置信区间 ==========
+# 读取各位教师导出的评分 CSV，给出每个分组（part1 评分维度 / part2 块类型 / part3 评分项）下
+# 三个模型的平均分、bootstrap 置信区间，以及两两模型差值的置信区间和检验 p 值。
+# 重抽样以 poid 为单位（同一样本的多位教师、多个评分项一起抽取），所有分组共用同一次抽样，
+# 因此模型差值是配对的。每次重抽样用一行“样本被抽中次数”的权重表示，
+# 一批重抽样的分组均值就是 权重矩阵 @ 每个样本的分数和 / 权重矩阵 @ 每个样本的评分数，
+# 各批次分给进程池并行计算。
+#
+# 用法：python bootstrap_ci.py --file 评分结果_T00*.csv --resamples 10000 [--out ci.csv]
+
+CHUNK_SIZE = 1000  # 每个进程任务的重抽样次数
+
+
+def poid_sums(table):
+    """-> (分组列表, 每个样本的分数和 [分组 × 样本 × 模型], 评分数 [分组 × 样本 × 模型])。"""
+    groups = table.groups()
+    unit_poids = np.array([u[0] for u in table.units])
+    poids, poid_idx = np.unique(unit_poids[table.unit], return_inverse=True)
+    sums = np.zeros((len(groups), len(poids), len(MODEL_NAMES)))
+    counts = np.zeros_like(sums)
+    for g, rows in enumerate(groups.values()):
+        np.add.at(sums[g], (poid_idx[rows], table.model[rows]), table.values[rows])
+        np.add.at(counts[g], (poid_idx[rows], table.model[rows]), 1)
+    return list(groups), sums, counts
+
+
+def _resample_chunk(sums, counts, n, seed):
+    """n 次重抽样的分组均值，形状 [n × 分组 × 模型]。"""
+    rng = np.random.default_rng(seed)
+    n_groups, n_poids, n_models = sums.shape
+    # 每行有放回地抽 n_poids 个样本，统计各样本被抽中的次数
+    draws = rng.integers(0, n_poids, size=(n, n_poids)) + np.arange(n)[:, None] * n_poids
+    weights = np.bincount(draws.ravel(), minlength=n * n_poids).reshape(n, n_poids).astype(np.float64)
+    # [样本 × (分组·模型)] 的二维矩阵乘法
+    flat_sums = sums.transpose(1, 0, 2).reshape(n_poids, -1)
+    flat_counts = counts.transpose(1, 0, 2).reshape(n_poids, -1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (weights @ flat_sums) / (weights @ flat_counts)
+    return means.reshape(n, n_groups, n_models)
+
+
+def bootstrap_means(sums, counts, resamples, seed=0, workers=None):
+    sizes = [CHUNK_SIZE] * (resamples // CHUNK_SIZE)
+    if resamples % CHUNK_SIZE:
+        sizes.append(resamples % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers == 1 or len(sizes) == 1:
+        return np.concatenate([_resample_chunk(sums, counts, n, s) for n, s in zip(sizes, seeds)])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_resample_chunk, sums, counts, n, s) for n, s in zip(sizes, seeds)]
+        return np.concatenate([f.result() for f in futures])
+
+
+def summarize(groups, sums, counts, boot, confidence=0.95):
+    alpha = (1 - confidence) / 2 * 100
+    with np.errstate(invalid="ignore", divide="ignore"):
+        point = sums.sum(axis=1) / counts.sum(axis=1)  # [分组 × 模型]
+    lo, hi = np.nanpercentile(boot, [alpha, 100 - alpha], axis=0)
+
+    means, diffs = [], []
+    for g, (part, dimension) in enumerate(groups):
+        for m, name in enumerate(MODEL_NAMES):
+            means.append({
+                "part": part, "dimension": dimension, "model": name,
+                "n": int(counts[g, :, m].sum()),
+                "mean": point[g, m], "ci_low": lo[g, m], "ci_high": hi[g, m],
+            })
+        for a, b in combinations(range(len(MODEL_NAMES)), 2):
+            d = boot[:, g, a] - boot[:, g, b]
+            d = d[~np.isnan(d)]
+            if len(d) == 0:
+                continue
+            d_lo, d_hi = np.percentile(d, [alpha, 100 - alpha])
+            # 双侧 bootstrap 检验：差值分布落在 0 两侧的较小比例 × 2
+            p = min(1.0, 2 * min((d <= 0).mean(), (d >= 0).mean()))
+            diffs.append({
+                "part": part, "dimension": dimension, "pair": f"{MODEL_NAMES[a]} - {MODEL_NAMES[b]}",
+                "diff": point[g, a] - point[g, b], "ci_low": d_lo, "ci_high": d_hi, "p_value": p,
+            })
+    return means, diffs
+
+
+def _write_csv(path, rows):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按样本重抽样，计算各模型平均分和模型差值的 bootstrap 置信区间")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="各教师导出的评分 CSV")
+    parser.add_argument("--resamples", type=int, default=10000, help="重抽样次数")
+    parser.add_argument("--confidence", type=float, default=0.95, help="置信水平")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数，1 表示不开进程池）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--out", type=str, default=None, help="结果另存为 CSV（均值写入该文件，差值写入 *_diff.csv）")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = load_exports(args.file)
+    groups, sums, counts = poid_sums(table)
+    boot = bootstrap_means(sums, counts, args.resamples, args.seed, args.workers)
+    means, diffs = summarize(groups, sums, counts, boot, args.confidence)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {len(table)} 条评分，{sums.shape[1]} 个样本，{len(groups)} 个分组，"
+          f"{args.resamples} 次重抽样，耗时 {elapsed:.2f}s（{args.workers or os.cpu_count()} 个进程）")
+    level = f"{args.confidence:.0%}"
+    for r in means:
+        print(f"{r['part']:<6} {r['dimension'][:14]:<16} {r['model']:<12} "
+              f"均值 {r['mean']:7.3f}  {level} CI [{r['ci_low']:7.3f}, {r['ci_high']:7.3f}]")
+    print()
+    for r in diffs:
+        print(f"{r['part']:<6} {r['dimension'][:14]:<16} {r['pair']:<26} "
+              f"差值 {r['diff']:7.3f}  {level} CI [{r['ci_low']:7.3f}, {r['ci_high']:7.3f}]  p = {r['p_value']:.4f}")
+
+    if args.out:
+        _write_csv(args.out, means)
+        diff_path = os.path.splitext(args.out)[0] + "_diff.csv"
+        _write_csv(diff_path, diffs)
+        print(f"✅ 已写入 {args.out} 和 {diff_path}")
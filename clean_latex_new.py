@@ -1,6 +1,6 @@
-import json
 import openai
-from tqdm import tqdm
+
+from latex_cleaner import LatexCleaner, add_cli_options, clean_files, cleaner_from_args
 
 # ==== 配置 ====
 client = openai.OpenAI(
@@ -10,8 +10,8 @@ client = openai.OpenAI(
 
 REAL_MODELS = ["DeepSeek-V3", "o4-mini", "Spark_X1"]
 
-def fix_latex_with_api(text: str) -> str:
-    prompt = f"""
+def build_prompt(text: str) -> str:
+    return f"""
         你是一个文本修复工具。你只允许修改数学公式的表示形式，其它任何字符、标点、换行都不允许修改。
         请将以下文本中所有非标准 LaTeX 数学表达式格式（如 \\(x\\)、(\\boxed{{0}})）转换为标准的 LaTeX 公式格式（$$...$$）。
         仅转换公式部分，**其它任何字符不得更改。**不要输出其他任何思考。
@@ -23,6 +23,9 @@ def fix_latex_with_api(text: str) -> str:
         原始内容如下：
         {text}
             """
+
+def fix_latex_with_api(text: str) -> str:
+    prompt = build_prompt(text)
     try:
         completion = client.chat.completions.create(
             model="deepseek-ai/DeepSeek-V3-0324",
@@ -36,38 +39,37 @@ def fix_latex_with_api(text: str) -> str:
         print("API 调用失败：", e)
         return text
 
-def process_file(filename: str):
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for sample in tqdm(data, desc="清洗中"):
+def iter_fields(data, start=0):
+    """逐个产出需要清洗的字段：(字段路径, 所在容器, 键)。路径在同一文件内唯一且稳定；
+    data 为从第 start 个样本开始的一段样本。"""
+    for i, sample in enumerate(data, start):
         content = sample.get("content", {})
 
         # === Part 2：清洗模型回复 ===
-        for item in content.get("part2", []):
+        for j, item in enumerate(content.get("part2", [])):
             for model in REAL_MODELS:
                 dialogue = item.get("content", {}).get(model, {}).get("dialogue", [])
-                for turn in dialogue:
+                for t, turn in enumerate(dialogue):
                     if "model_respond" in turn:
-                        turn["model_respond"] = fix_latex_with_api(turn["model_respond"])
+                        yield f"{i}/part2/{j}/{model}/{t}/model_respond", turn, "model_respond"
 
         # === Part 3：只清洗 user 和 gt，不动模型回复 ===
-        for item in content.get("part3", []):
+        for j, item in enumerate(content.get("part3", [])):
             single = item.get("single_dialog", {})
-            if "user" in single:
-                single["user"] = fix_latex_with_api(single["user"])
-            if "gt" in single:
-                single["gt"] = fix_latex_with_api(single["gt"])
-
-    output_path = filename.replace(".json", "_fixed.json")
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+            for key in ("user", "gt"):
+                if key in single:
+                    yield f"{i}/part3/{j}/{key}", single, key
 
-    print(f"✅ 清洗完成，保存为：{output_path}")
+def process_files(filenames, cleaner: LatexCleaner):
+    # 流式读取各文件，每轮的字段合并去重后一起并发清洗，依次写出各自的 _fixed.json
+    for output_path in clean_files(filenames, iter_fields, cleaner, desc="清洗中"):
+        print(f"✅ 清洗完成，保存为：{output_path}")
+    print(cleaner.report())
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="清洗 Part2 + Part3 的 Latex 格式")
-    parser.add_argument("--file", type=str, required=True, help="输入 JSON 文件名，如 data_T001_generated.json")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="输入 JSON 文件名，可给多个，如 data_T001_generated.json")
+    add_cli_options(parser)
     args = parser.parse_args()
-    process_file(args.file)
+    process_files(args.file, cleaner_from_args(client, build_prompt, args))
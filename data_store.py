@@ -0,0 +1,256 @@
+import json
+import mmap
+import os
+import threading
+from functools import lru_cache
+
+from json_stream import iter_array
+
+# ========== 进程级数据集缓存 ==========
+# Streamlit 每次交互都会重跑 main()，这里让同一进程内的所有会话共享一份已解析的数据。
+# 缓存按 (文件路径, mtime) 区分：文件在磁盘上被替换后，下一次访问会自动重新加载。
+# 注意：缓存中的数据被所有教师会话共享，调用方只能读取，不能修改。
+#
+# 教师数据 data_Txxx.json 会被转换成随机访问的样本库（放在同目录下）：
+#   data_Txxx.samples.jsonl     每行一个样本
+#   data_Txxx.samples.idx.json  每个样本的字节偏移、poid 和 part3 题目类型
+# 页面只解码当前显示的样本，样本库通过 mmap 读取，多个服务进程共享同一份页缓存。
+
+STORE_SUFFIX = ".samples.jsonl"
+INDEX_SUFFIX = ".samples.idx.json"
+DECODED_CACHE_SIZE = 16  # 每个样本库保留的已解码样本数
+
+
+class Dataset:
+    """一位教师的数据文件（整体加载到内存）：样本列表 + 预建索引。"""
+
+    def __init__(self, path: str, mtime: int, samples: list):
+        self.path = path
+        self.mtime = mtime
+        self.samples = samples
+
+        # poid -> 样本下标，用于导出时显示“第 x / y 条”
+        self.poid_to_index = {}
+        # (poid, question_id) -> part3 条目，用于导出时查询题目类型
+        self.part3_index = {}
+        for i, sample in enumerate(samples):
+            poid = sample.get("poid", f"id_{i}")
+            self.poid_to_index[poid] = i
+            for item in sample.get("content", {}).get("part3", []):
+                self.part3_index[(poid, item.get("question_id"))] = item
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        return self.samples[idx]
+
+    def __iter__(self):
+        return iter(self.samples)
+
+    def get_by_poid(self, poid: str):
+        idx = self.poid_to_index.get(poid)
+        return None if idx is None else self.samples[idx]
+
+    def sample_nbytes(self, idx: int) -> int:
+        # 样本已常驻内存并被所有会话共享，再引用一次不占额外空间
+        return 0
+
+    def part3_item(self, poid: str, question_id: str):
+        return self.part3_index.get((poid, question_id))
+
+    def part3_type(self, poid: str, question_id: str, default: str = "correct") -> str:
+        item = self.part3_item(poid, question_id)
+        return item.get("type", default) if item else default
+
+
+class SampleStore:
+    """随机访问的样本库：按下标或 poid 只解码需要的那一条样本。"""
+
+    def __init__(self, path: str, mtime: int, store_path: str, index: dict):
+        self.path = path
+        self.mtime = mtime
+        self.store_path = store_path
+        self.offsets = index["offsets"]  # 长度为 n + 1，最后一个是文件末尾
+        self.poid_to_index = {poid: i for i, poid in enumerate(index["poids"])}
+        # (poid, question_id) -> part3 题目类型
+        self.part3_types = {
+            (poid, qid): q_type
+            for poid, items in index["part3_types"].items()
+            for qid, q_type in items.items()
+        }
+
+        self._mm = None
+        if len(self) > 0:
+            with open(store_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._decode = lru_cache(maxsize=DECODED_CACHE_SIZE)(self._decode_uncached)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self._decode(idx)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._decode_uncached(i)
+
+    def _decode_uncached(self, idx: int) -> dict:
+        return json.loads(self._mm[self.offsets[idx]:self.offsets[idx + 1]])
+
+    def get_by_poid(self, poid: str):
+        idx = self.poid_to_index.get(poid)
+        return None if idx is None else self[idx]
+
+    def sample_nbytes(self, idx: int) -> int:
+        return self.offsets[idx + 1] - self.offsets[idx]
+
+    def part3_item(self, poid: str, question_id: str):
+        sample = self.get_by_poid(poid)
+        if sample is None:
+            return None
+        for item in sample.get("content", {}).get("part3", []):
+            if item.get("question_id") == question_id:
+                return item
+        return None
+
+    def part3_type(self, poid: str, question_id: str, default: str = "correct") -> str:
+        return self.part3_types.get((poid, question_id), default)
+
+
+# ========== 样本库构建 ==========
+def store_paths(json_path: str):
+    base = json_path[:-len(".json")] if json_path.endswith(".json") else json_path
+    return base + STORE_SUFFIX, base + INDEX_SUFFIX
+
+
+def build_sample_store(json_path: str) -> dict:
+    """把 data_Txxx.json 转成 JSONL 样本库 + 偏移索引，返回索引内容。"""
+    json_path = os.path.abspath(json_path)
+    store_path, index_path = store_paths(json_path)
+    mtime = os.stat(json_path).st_mtime_ns
+
+    offsets = [0]
+    poids = []
+    part3_types = {}
+    tmp_store = f"{store_path}.{os.getpid()}.tmp"
+    with open(tmp_store, "wb") as out:
+        for i, sample in enumerate(iter_array(json_path)):
+            line = (json.dumps(sample, ensure_ascii=False) + "\n").encode("utf-8")
+            out.write(line)
+            offsets.append(offsets[-1] + len(line))
+            poid = sample.get("poid", f"id_{i}")
+            poids.append(poid)
+            part3_types[poid] = {
+                item.get("question_id"): item.get("type", "correct")
+                for item in sample.get("content", {}).get("part3", [])
+            }
+
+    index = {
+        "source_mtime": mtime,
+        "size": offsets[-1],
+        "offsets": offsets,
+        "poids": poids,
+        "part3_types": part3_types,
+    }
+    tmp_index = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    # 先替换样本库再替换索引：索引里记录了源文件 mtime 和样本库大小，二者不一致时会重新构建
+    os.replace(tmp_store, store_path)
+    os.replace(tmp_index, index_path)
+    return index
+
+
+def _read_store_index(json_path: str, mtime: int):
+    store_path, index_path = store_paths(json_path)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("source_mtime") != mtime or os.path.getsize(store_path) != index.get("size"):
+            return None
+        return index
+    except (OSError, ValueError):
+        return None
+
+
+def _open(path: str, mtime: int):
+    index = _read_store_index(path, mtime)
+    if index is None:
+        try:
+            index = build_sample_store(path)
+        except OSError:
+            # 数据目录不可写（或 Windows 下样本库正被其它进程映射）时退回整体加载
+            index = None
+    if index is not None and index["source_mtime"] == mtime:
+        return SampleStore(path, mtime, store_paths(path)[0], index)
+
+    with open(path, "r", encoding="utf-8") as f:
+        return Dataset(path, mtime, json.load(f))
+
+
+# ========== 缓存入口 ==========
+_cache = {}          # 路径 -> Dataset / SampleStore
+_path_locks = {}     # 路径 -> 加载锁（同一文件只解析一次）
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _path_lock(path: str) -> threading.Lock:
+    with _lock:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def load_dataset(path: str):
+    """读取教师数据文件；命中缓存时不再解析。文件不存在时抛出 FileNotFoundError。"""
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+
+    dataset = _cache.get(path)
+    if dataset is not None and dataset.mtime == mtime:
+        with _lock:
+            _stats["hits"] += 1
+        return dataset
+
+    with _path_lock(path):
+        # 可能已被其它会话在等待锁期间加载完成
+        dataset = _cache.get(path)
+        if dataset is not None and dataset.mtime == mtime:
+            with _lock:
+                _stats["hits"] += 1
+            return dataset
+
+        dataset = _open(path, mtime)
+        _cache[path] = dataset
+        with _lock:
+            _stats["misses"] += 1
+        return dataset
+
+
+def cache_stats() -> dict:
+    with _lock:
+        return {**_stats, "cached_files": len(_cache)}
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把教师数据 JSON 转换为可随机访问的样本库（JSONL + 偏移索引）")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="输入的 JSON 文件名，如 data_T001.json")
+    args = parser.parse_args()
+
+    for file in args.file:
+        idx = build_sample_store(file)
+        print(f"✅ {file}：共 {len(idx['poids'])} 条样本，已生成 {store_paths(file)[0]}")
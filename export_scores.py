@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+
+from score_model import ScoreBook, to_python
+
+# ========== 评分导出 ==========
+# 逐行生成导出记录（生成器），直接编码写入一个字节缓冲区，不再经过 DataFrame、CSV 字符串和 base64。
+# 注意：st.download_button 只接受完整的 bytes / 文件对象，并把整份文件放进 MediaFileManager，
+# 因此导出文件仍然整份驻留内存，内存占用随导出大小线性增长（约为文件大小本身）。
+# 评分直接从 score_model.ScoreBook 的矩阵中读取，样本序号和 part3 题目类型查数据集的预建索引。
+
+COLUMNS = [
+    "poid", "sample_index_display", "part", "type", "dimension",
+    "score_DeepSeek-V3", "score_o4-mini", "score_Spark_X1",
+]
+
+PART2_TYPE_MAP = {
+    "1": "引导质量（理解）",
+    "2": "引导质量（不理解）",
+    "3": "导正话题"
+}
+
+PART3_LABELS = {
+    "correct": ["正确理解", "正确反馈"],
+    "error": ["正确理解", "正确反馈"],
+    "question": ["正确理解", "正确反馈"]
+}
+
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "JSONL": ("jsonl", "application/jsonl"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+PARQUET_CHUNK_ROWS = 10000
+
+
+def _scores_row(poid, index_display, part, q_type, dimension, values):
+    scores = ["" if v is None else v for v in map(to_python, values)]
+    return {
+        "poid": poid,
+        "sample_index_display": index_display,
+        "part": part,
+        "type": q_type,
+        "dimension": dimension,
+        "score_DeepSeek-V3": scores[0],
+        "score_o4-mini": scores[1],
+        "score_Spark_X1": scores[2]
+    }
+
+
+def iter_score_rows(book: ScoreBook, dataset):
+    """按 part1 / part2 / part3 的顺序逐行产出导出记录；只导出已完成偏好排序的样本。"""
+    total_pages = len(dataset)
+    poid_to_index = dataset.poid_to_index
+    completed = book.completed_poids()
+    exported = [(poid, sample) for poid, sample in book.samples.items() if poid in completed]
+
+    def index_display(poid):
+        return f"{poid_to_index.get(poid, -1) + 1} / {total_pages}"
+
+    # ==== Part1 ====
+    for poid, sample in exported:
+        for (_, dim), values in sample.parts["part1"].filled_rows():
+            yield _scores_row(poid, index_display(poid), "part1", dim, dim, values)
+
+    # ==== Part2 ====
+    for poid, sample in exported:
+        for (_, tval), values in sample.parts["part2"].filled_rows():
+            dimension = PART2_TYPE_MAP.get(tval, "未知类型")
+            # type 列沿用旧导出的固定标签 _block0：score_tables / agreement 按 (poid, part, type, dimension)
+            # 加出现序号构造评分单元，改成真实块序号会让新旧导出文件的单元键对不上
+            yield _scores_row(poid, index_display(poid), "part2", f"{dimension}_block0", dimension, values)
+
+    # ==== Part3 ====
+    for poid, sample in exported:
+        for (qid, score_type), values in sample.parts["part3"].filled_rows():
+            score_idx = int(score_type)
+            q_type = dataset.part3_type(poid, qid)
+            labels = PART3_LABELS.get(q_type, PART3_LABELS["correct"])
+            dimension = labels[score_idx] if score_idx < len(labels) else f"评分项{score_idx}"
+            yield _scores_row(poid, index_display(poid), "part3", q_type, dimension, values)
+
+
+# ========== 写出 ==========
+def write_csv(rows, out):
+    # utf-8-sig：Excel 打开时不乱码
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")
+    writer = csv.DictWriter(text, fieldnames=COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+    text.flush()
+    text.detach()
+
+
+def write_jsonl(rows, out):
+    for row in rows:
+        out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def write_parquet(rows, out):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # 分数列按浮点写出，未评分（空字符串）写为空值
+    schema = pa.schema(
+        [(c, pa.string()) for c in COLUMNS[:5]] + [(c, pa.float64()) for c in COLUMNS[5:]]
+    )
+    with pq.ParquetWriter(out, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= PARQUET_CHUNK_ROWS:
+                writer.write_table(_parquet_table(pa, chunk, schema))
+                chunk = []
+        if chunk:
+            writer.write_table(_parquet_table(pa, chunk, schema))
+
+
+def _parquet_table(pa, chunk, schema):
+    columns = {c: [row[c] for row in chunk] for c in COLUMNS[:5]}
+    for c in COLUMNS[5:]:
+        columns[c] = [None if row[c] == "" else float(row[c]) for row in chunk]
+    return pa.table(columns, schema=schema)
+
+
+WRITERS = {"CSV": write_csv, "JSONL": write_jsonl, "Parquet": write_parquet}
+
+
+def export_to_bytes(rows, fmt: str = "CSV") -> bytes:
+    """把记录写成导出文件的字节串，交给 st.download_button。整份文件在内存中，大小与导出行数成正比。"""
+    out = io.BytesIO()
+    WRITERS[fmt](rows, out)
+    return out.getvalue()
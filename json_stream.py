@@ -0,0 +1,141 @@
+import json
+import os
+
+# ========== 流式读写 JSON 数组 ==========
+# 数据文件都是“一个大数组、每个元素一个样本”的格式（data_Txxx.json、*_generated.json、*_fixed.json），
+# 原来各脚本 json.load 整个文件、处理完再 json.dump 回去，内存和耗时随语料大小增长。
+#   iter_array(path)    按块读取文件，用 JSONDecoder.raw_decode 逐个解析数组元素，一次只持有一个样本
+#   ArrayWriter(path)   逐个写入样本，攒够一块再写盘，输出与 json.dump(列表, indent=2) 逐字节一致；
+#                       先写临时文件，正常退出 with 块时才替换目标文件，中途出错不会留下半个文件
+#   iter_strings(node)  深度优先产出已解析 JSON 中的全部字符串值（不含对象的键）
+#
+# 用法：
+#   with ArrayWriter("out.json") as out:
+#       for sample in iter_array("in.json"):
+#           out.write(sample)
+
+READ_CHUNK = 1 << 16   # 字符
+WRITE_CHUNK = 1 << 16  # 字符
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class _Reader:
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int):
+        more = self.f.read(size)
+        self.eof = not more
+        self.buf = self.buf[self.pos:] + more  # 丢掉已解析的部分
+        self.pos = 0
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符；文件结束返回空串。"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill(self.chunk_size)
+
+    def decode(self):
+        self.peek()  # raw_decode 不跳过开头的空白
+        while True:
+            try:
+                item, end = _decoder.raw_decode(self.buf, self.pos)
+                # 只有数字可能在块边界处被截断（"2.5" 读到 "2."），确认其后已有非数字字符
+                number = isinstance(item, (int, float)) and not isinstance(item, bool)
+                if self.eof or (end < len(self.buf) and not (number and self.buf[end] in _NUMBER_CHARS)):
+                    self.pos = end
+                    return item
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # 元素跨越块边界：补读（至少翻倍，避免大元素反复从头解析）
+            self._fill(max(self.chunk_size, len(self.buf) - self.pos))
+
+
+def iter_array(path: str, chunk_size: int = READ_CHUNK):
+    """逐个产出 JSON 数组文件中的元素。"""
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        if reader.peek() != "[":
+            raise ValueError(f"{path} 不是 JSON 数组")
+        reader.pos += 1
+        if reader.peek() == "]":
+            return
+        while True:
+            yield reader.decode()
+            c = reader.peek()
+            if c == "]":
+                return
+            if c != ",":
+                raise ValueError(f"{path} 格式错误：数组元素之后应为逗号或 ]，实际为 {c!r}")
+            reader.pos += 1
+
+
+class ArrayWriter:
+    def __init__(self, path: str, indent: int = 2):
+        self.path = path
+        self.indent = indent
+        self.count = 0
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._pending = []
+        self._pending_size = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self._tmp, "w", encoding="utf-8")
+        return self
+
+    def write(self, item):
+        text = json.dumps(item, ensure_ascii=False, indent=self.indent)
+        if self.indent is None:
+            text = ("[" if self.count == 0 else ", ") + text
+        else:
+            # 字符串里的换行都已转义，这里的换行都是缩进换行
+            pad = " " * self.indent
+            text = ("[\n" if self.count == 0 else ",\n") + pad + text.replace("\n", "\n" + pad)
+        self.count += 1
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= WRITE_CHUNK:
+            self._flush()
+
+    def _flush(self):
+        self._f.write("".join(self._pending))
+        self._pending = []
+        self._pending_size = 0
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._f.close()
+            os.remove(self._tmp)
+            return False
+        if self.count == 0:
+            self._pending.append("[]")
+        else:
+            self._pending.append("]" if self.indent is None else "\n]")
+        self._flush()
+        self._f.close()
+        os.replace(self._tmp, self.path)
+        return False
+
+
+def iter_strings(node):
+    """按出现顺序产出 node（dict / list / str 嵌套）中的全部字符串值。"""
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from iter_strings(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from iter_strings(value)
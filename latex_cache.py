@@ -0,0 +1,62 @@
+import hashlib
+import sqlite3
+import time
+
+# ========== LaTeX 修复结果缓存 ==========
+# 同一段文字在不同教师文件、不同样本之间大量重复（data_T001~T003、T004~T006 完全相同，
+# 简短的学生发言更是反复出现）。这里把接口的修复结果按内容存进本地 SQLite：
+#   键 = sha256(提示词版本, 模型, 原文)
+# 提示词版本由提示词模板本身的哈希得到，修改提示词后旧结果自动失效。
+# 只缓存接口成功返回的结果，失败后保留原文的字段下次仍会重新请求。
+
+LATEX_CACHE_PATH = "latex_cache.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixes (
+    key        TEXT PRIMARY KEY,
+    result     TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def prompt_version(build_prompt) -> str:
+    return hashlib.sha256(build_prompt("\x00").encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(version: str, model: str, text: str) -> str:
+    return hashlib.sha256("\x00".join((version, model, text)).encode("utf-8")).hexdigest()
+
+
+class LatexCache:
+    def __init__(self, path: str = LATEX_CACHE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._conn.execute(
+                f"SELECT key, result FROM fixes WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return found
+
+    def put(self, key: str, result: str):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fixes (key, result, created_at) VALUES (?, ?, ?)",
+                (key, result, time.time()),
+            )
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM fixes").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,446 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import ExitStack
+from itertools import islice
+
+import openai
+from tqdm import tqdm
+
+from latex_cache import LATEX_CACHE_PATH, LatexCache, cache_key, prompt_version
+from json_stream import ArrayWriter, iter_array
+from latex_normalize import normalize, prose_unchanged
+
+# ========== 并发 LaTeX 清洗引擎 ==========
+# clean_latex.py / clean_latex_new.py 原来逐条同步调用接口，一个教师文件要跑几个小时。
+# 这里用 asyncio 并发发送请求：
+#   - 信号量限制同时在途的请求数（concurrency）
+#   - 令牌桶限制每秒发出的请求数（rps），突发上限为 1 秒的量
+#   - 每次请求单独超时；超时、连接失败、限流、服务端错误按指数退避（带随机抖动）重试
+#   - 重试用尽或遇到不可重试的错误时保留原文（与原脚本行为一致）
+# 结果按输入顺序返回，调用方按字段位置写回即可。
+# 相同的原文只请求一次（可以跨多个输入文件），成功的结果写入 latex_cache，下次运行直接复用。
+# 默认先用 latex_normalize 在本地改写定界符，只有拿不准的字符串才请求接口；
+# 接口的回复如果改动了公式之外的正文，则作废并改用本地规范化的结果。
+# 各脚本保留自己的提示词和字段遍历，只把 build_prompt 和客户端交给引擎；
+# --base-url 可以指向本地的桩服务器做联调。
+#
+# 批量模式（--batch-tokens > 0）：单条字段通常只有几十个字，却要带上几百字的说明提示词。
+# 这里把多条待请求的字段按 JSON 字符串数组打包进一次请求（说明提示词仍由脚本的 build_prompt 生成），
+# 要求模型返回同样长度的 JSON 数组，再逐条校验（非空、正文未被改动）。
+#   - 回复无法解析或长度不符：整批改为逐条请求，并把批量的 token 预算减半
+#   - 解析成功：预算逐步放大，回到 --batch-tokens 为止；校验失败的个别字段单独重发
+# 报告中给出按逐条发送估算的调用次数、token 数，与实际值对比。
+#
+# 断点续跑：clean_files 在每个字段完成时把 {字段路径, 原文哈希, 结果} 追加到 *_fixed.journal.jsonl。
+# 中途崩溃或 Ctrl-C 后重新运行，原文哈希一致的字段直接取日志中的结果，只重做没有完成的字段。
+# 接口调用失败（保留原文）的字段不写日志，下次运行会重新请求；全部完成后删除日志。
+#
+# 输入输出都是流式的（json_stream）：各文件同步地每轮读取 STREAM_SAMPLES 个样本，清洗后立即写出，
+# 内存占用与语料总量无关。同一轮内跨文件去重，轮与轮之间的重复由 latex_cache 复用。
+# 所有轮次在同一个事件循环里执行（异步客户端的连接池绑定在创建它的事件循环上，不能跨 asyncio.run 复用）。
+
+MODEL = "deepseek-ai/DeepSeek-V3-0324"
+
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+BATCH_TEXT_PLACEHOLDER = "（见下方 JSON 数组中的各个元素）"
+BATCH_INSTRUCTION = """
+        批量处理：输入是一个 JSON 字符串数组，请对数组中的每个元素分别按上述要求处理。
+        只输出一个同样长度的 JSON 字符串数组，元素顺序与输入一致，不要输出其它任何内容。
+        输入：
+"""
+STREAM_SAMPLES = 200  # 每轮从每个文件读取的样本数
+MIN_BATCH_TOKENS = 200
+BATCH_GROWTH = 1.25
+CODE_FENCE = re.compile(r"^```[A-Za-z]*\s*|\s*```$")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（中文约 1 字 1 token，UTF-8 下 3 字节）。"""
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+def parse_batch_reply(reply: str, n: int):
+    """批量回复 -> n 个字符串；格式不符返回 None。"""
+    try:
+        pieces = json.loads(CODE_FENCE.sub("", reply.strip()))
+    except ValueError:
+        return None
+    if not isinstance(pieces, list) or len(pieces) != n or not all(isinstance(p, str) for p in pieces):
+        return None
+    return pieces
+
+
+def async_client_like(client: openai.OpenAI, base_url: str = None) -> openai.AsyncOpenAI:
+    """按脚本里已有的同步客户端配置创建异步客户端（可改用其它 base_url）。"""
+    return openai.AsyncOpenAI(
+        base_url=base_url or str(client.base_url),
+        api_key=client.api_key,
+        max_retries=0,  # 重试由引擎统一处理
+    )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def with_progress(bar, on_result=None):
+    """把 on_result 包一层，每完成一条推进进度条。"""
+    def progress(i, fixed, ok):
+        bar.update(1)
+        if on_result is not None:
+            on_result(i, fixed, ok)
+    return progress
+
+
+class LatexCleaner:
+    def __init__(self, client: openai.AsyncOpenAI, build_prompt, model: str = MODEL,
+                 concurrency: int = 8, rps: float = 5.0, timeout: float = 120.0,
+                 max_retries: int = 4, backoff: float = 1.0, cache: LatexCache = None,
+                 local: bool = True, batch_tokens: int = 0):
+        self.client = client
+        self.build_prompt = build_prompt
+        self.model = model
+        self.cache = cache
+        self.local = local
+        self.version = prompt_version(build_prompt)
+        self.concurrency = concurrency
+        self.rps = rps
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch_tokens = batch_tokens
+        self.stats = {"fields": 0, "unique": 0, "local": 0, "cache_hits": 0,
+                      "requests": 0, "retries": 0, "failed": 0, "rejected": 0,
+                      "batches": 0, "batch_failed": 0, "resent": 0,
+                      "sent": 0, "tokens": 0, "single_tokens": 0,
+                      "single_calls": 0, "single_latency": 0.0}
+
+    async def _request(self, prompt: str, batch: bool = False) -> str:
+        self.stats["requests"] += 1
+        start = time.perf_counter()
+        completion = await asyncio.wait_for(
+            self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+            ),
+            self.timeout,
+        )
+        content = completion.choices[0].message.content.strip()
+        if not batch:
+            self.stats["single_calls"] += 1
+            self.stats["single_latency"] += time.perf_counter() - start
+        usage = getattr(completion, "usage", None)
+        self.stats["tokens"] += usage.total_tokens if usage else estimate_tokens(prompt) + estimate_tokens(content)
+        return content
+
+    def _batch_prompt(self, texts: list) -> str:
+        return self.build_prompt(BATCH_TEXT_PLACEHOLDER) + BATCH_INSTRUCTION + json.dumps(texts, ensure_ascii=False)
+
+    def _acceptable(self, text: str, fixed: str, verify: bool) -> bool:
+        if fixed is None or not fixed.strip():
+            return False
+        if verify and not prose_unchanged(text, fixed):
+            self.stats["rejected"] += 1
+            return False
+        return True
+
+    async def _complete(self, prompt: str, semaphore, bucket, batch: bool = False):
+        """发送一个提示词，失败时按指数退避重试；最终失败返回 None。"""
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire()
+                try:
+                    return await self._request(prompt, batch)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        print("API 调用失败（重试用尽）：", type(e).__name__, e)
+                        break
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+                except openai.OpenAIError as e:
+                    print("API 调用失败：", type(e).__name__, e)
+                    break
+        self.stats["failed"] += 1
+        return None
+
+    async def clean_all(self, texts: list, on_result=None) -> list:
+        """并发清洗 texts，按原顺序返回结果；on_result(下标, 结果, 是否成功) 在每条完成时调用。
+        接口失败或回复被拒而保留原文 / 本地结果时“是否成功”为 False。"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        bucket = TokenBucket(self.rps)
+        results = list(texts)
+
+        # 去重：原文 -> 所有出现位置
+        positions = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(text, []).append(i)
+        keys = {text: cache_key(self.version, self.model, text) for text in positions}
+        cached = self.cache.get_many(keys.values()) if self.cache is not None else {}
+        self.stats["fields"] += len(texts)
+        self.stats["unique"] += len(positions)
+
+        def scatter(text, fixed, ok=True):
+            for i in positions[text]:
+                results[i] = fixed
+                if on_result is not None:
+                    on_result(i, fixed, ok)
+
+        def finish(text, fixed, fallback):
+            if fixed is None:
+                scatter(text, fallback, ok=False)
+                return
+            if self.cache is not None:
+                self.cache.put(keys[text], fixed)
+            scatter(text, fixed)
+
+        async def clean_one(text, fallback):
+            fixed = await self._complete(self.build_prompt(text), semaphore, bucket)
+            finish(text, fixed if self._acceptable(text, fixed, self.local) else None, fallback)
+
+        budget = self.batch_tokens
+
+        async def batch_worker(queue):
+            nonlocal budget
+            while queue:
+                # 按当前预算从队首取一批
+                batch = [queue.popleft()]
+                size = estimate_tokens(batch[0][0])
+                while queue and size + estimate_tokens(queue[0][0]) <= budget:
+                    batch.append(queue.popleft())
+                    size += estimate_tokens(batch[-1][0])
+                if len(batch) == 1:
+                    await clean_one(*batch[0])
+                    continue
+
+                self.stats["batches"] += 1
+                reply = await self._complete(self._batch_prompt([t for t, _ in batch]), semaphore, bucket, batch=True)
+                pieces = parse_batch_reply(reply, len(batch)) if reply is not None else None
+                if pieces is None:
+                    self.stats["batch_failed"] += 1
+                    budget = max(MIN_BATCH_TOKENS, budget // 2)
+                    retry = batch
+                else:
+                    budget = min(self.batch_tokens, int(budget * BATCH_GROWTH))
+                    retry = []
+                    for (text, fallback), fixed in zip(batch, pieces):
+                        # 批量回复可能错位，无论是否启用本地规范化都逐条校验正文
+                        if self._acceptable(text, fixed, verify=True):
+                            finish(text, fixed, fallback)
+                        else:
+                            retry.append((text, fallback))
+                self.stats["resent"] += len(retry)
+                await asyncio.gather(*(clean_one(t, fb) for t, fb in retry))
+
+        pending = []
+        for text in positions:
+            fallback, ambiguous = normalize(text) if self.local else (text, True)
+            if not ambiguous:
+                self.stats["local"] += 1
+                scatter(text, fallback)
+            elif keys[text] in cached:
+                self.stats["cache_hits"] += 1
+                scatter(text, cached[keys[text]])
+            else:
+                pending.append((text, fallback))
+        self.stats["sent"] += len(pending)
+        overhead = estimate_tokens(self.build_prompt(""))
+        self.stats["single_tokens"] += sum(overhead + 2 * estimate_tokens(t) for t, _ in pending)
+        if self.batch_tokens > 0:
+            queue = deque(pending)
+            await asyncio.gather(*(batch_worker(queue) for _ in range(self.concurrency)))
+        else:
+            await asyncio.gather(*(clean_one(t, fb) for t, fb in pending))
+        return results
+
+    def run(self, texts: list, desc: str = "清洗中", on_result=None) -> list:
+        with tqdm(total=len(texts), desc=desc) as bar:
+            start = time.perf_counter()
+            try:
+                return asyncio.run(self.clean_all(texts, on_result=with_progress(bar, on_result)))
+            finally:
+                self.add_seconds(time.perf_counter() - start)
+
+    def add_seconds(self, seconds: float):
+        self.stats["seconds"] = round(self.stats.get("seconds", 0) + seconds, 2)
+
+    def report(self) -> str:
+        s = self.stats
+        saved = s["fields"] - s["sent"]
+        text = f"从日志恢复 {s['resumed']} 个字段；" if s.get("resumed") else ""
+        text += (f"字段 {s['fields']} 个，去重后 {s['unique']} 个，本地完成 {s['local']} 个，缓存命中 {s['cache_hits']} 个，"
+                f"实际请求 {s['requests']} 次（重试 {s['retries']} 次，失败 {s['failed']} 个，回复改动正文被拒 {s['rejected']} 个），"
+                f"节省调用 {saved} 次，耗时 {s.get('seconds', 0)}s")
+        if s["batches"]:
+            text += (f"\n批量请求 {s['batches']} 次（格式不符 {s['batch_failed']} 次，逐条重发 {s['resent']} 个）；"
+                     f"逐条发送估算 {s['sent']} 次调用、约 {s['single_tokens']} tokens，"
+                     f"实际 {s['requests']} 次调用、约 {s['tokens']} tokens")
+            if s["single_calls"]:
+                # 按本次逐条请求的平均延迟和并发数（及 rps 上限）估算全部逐条发送的耗时
+                latency = s["single_latency"] / s["single_calls"]
+                single_seconds = max(s["sent"] * latency / self.concurrency, s["sent"] / self.rps)
+                text += f"，逐条发送估算耗时 {single_seconds:.1f}s（实际 {s.get('seconds', 0)}s）"
+        return text
+
+
+def add_cli_options(parser):
+    parser.add_argument("--base-url", type=str, default=None, help="接口地址（默认使用脚本中配置的地址，可指向本地桩服务器）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时在途的请求数")
+    parser.add_argument("--rps", type=float, default=5.0, help="每秒最多发出的请求数")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单次请求超时（秒）")
+    parser.add_argument("--cache", type=str, default=LATEX_CACHE_PATH, help="修复结果缓存（SQLite）路径")
+    parser.add_argument("--no-cache", action="store_true", help="不读写缓存")
+    parser.add_argument("--no-local", action="store_true", help="不做本地规范化，所有字段都请求接口")
+    parser.add_argument("--batch-tokens", type=int, default=1500,
+                        help="批量模式每次请求打包的原文 token 预算（0 表示逐条请求）")
+
+
+def cleaner_from_args(client: openai.OpenAI, build_prompt, args) -> LatexCleaner:
+    return LatexCleaner(
+        async_client_like(client, args.base_url), build_prompt,
+        concurrency=args.concurrency, rps=args.rps, timeout=args.timeout,
+        cache=None if args.no_cache else LatexCache(args.cache),
+        local=not args.no_local, batch_tokens=args.batch_tokens,
+    )
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def journal_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + ".journal.jsonl"
+
+
+def load_journal(path: str) -> dict:
+    """读取日志：字段路径 -> (原文哈希, 结果)。
+    按字节读取、逐行解码：崩溃时写了一半的最后一行（可能截断在多字节字符中间）直接忽略。"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line.decode("utf-8"))
+            except ValueError:  # 包括 UnicodeDecodeError
+                continue
+            done[record["path"]] = (record["hash"], record["result"])
+    return done
+
+
+def _open_journal(path: str):
+    """以二进制追加方式打开日志；上次中断在半行处时先补一个换行，新记录另起一行。"""
+    needs_newline = False
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    f = open(path, "ab")
+    if needs_newline:
+        f.write(b"\n")
+    return f
+
+
+def _journal_line(path: str, digest: str, fixed: str) -> bytes:
+    return (json.dumps({"path": path, "hash": digest, "result": fixed}, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _rounds(filenames, size: int):
+    """各文件同步地每轮读取 size 个样本：产出 (本轮首个样本的下标, [(文件下标, 样本列表)])。"""
+    readers = [iter_array(filename) for filename in filenames]
+    start = 0
+    while True:
+        chunks = [(d, list(islice(reader, size))) for d, reader in enumerate(readers)]
+        chunks = [(d, samples) for d, samples in chunks if samples]
+        if not chunks:
+            return
+        yield start, chunks
+        start += size
+
+
+def clean_files(filenames, iter_fields, cleaner: LatexCleaner, desc: str = "清洗中"):
+    """流式读取多个文件，按轮清洗（同一轮内跨文件去重）并写出各自的 *_fixed.json；返回输出路径列表。
+    完成的字段随时写入日志，重新运行时从日志续跑。iter_fields(样本列表, 起始下标) 产出字段。"""
+    outputs = [filename.replace(".json", "_fixed.json") for filename in filenames]
+    journals = [journal_path(output_path) for output_path in outputs]
+    done = [load_journal(path) for path in journals]
+    unfinished = [0] * len(filenames)
+    cleaner.stats.setdefault("resumed", 0)
+
+    async def clean_rounds(writers, journal_files, bar):
+        for start, chunks in _rounds(filenames, STREAM_SAMPLES):
+            # 原文哈希与日志一致的字段直接取日志中的结果
+            fields = []
+            for d, samples in chunks:
+                for path, container, key in iter_fields(samples, start):
+                    digest = text_hash(container[key])
+                    entry = done[d].get(path)
+                    if entry is not None and entry[0] == digest:
+                        container[key] = entry[1]
+                        cleaner.stats["resumed"] += 1
+                    else:
+                        fields.append((d, path, digest, container, key))
+
+            def record(i, fixed, ok):
+                d, path, digest, container, key = fields[i]
+                container[key] = fixed
+                if not ok:
+                    unfinished[d] += 1
+                    return
+                journal_files[d].write(_journal_line(path, digest, fixed))
+                journal_files[d].flush()
+
+            bar.total += len(fields)
+            bar.refresh()
+            await cleaner.clean_all([container[key] for _, _, _, container, key in fields],
+                                    on_result=with_progress(bar, record))
+            for d, samples in chunks:
+                for sample in samples:
+                    writers[d].write(sample)
+
+    start_time = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            writers = [stack.enter_context(ArrayWriter(path)) for path in outputs]
+            journal_files = [stack.enter_context(_open_journal(path)) for path in journals]
+            bar = stack.enter_context(tqdm(total=0, desc=desc))
+            asyncio.run(clean_rounds(writers, journal_files, bar))
+    except KeyboardInterrupt:
+        print(f"⚠️ 已中断，完成的字段已写入日志（{', '.join(journals)}），重新运行同样的命令即可续跑")
+        raise
+    finally:
+        cleaner.add_seconds(time.perf_counter() - start_time)
+
+    for path, failed in zip(journals, unfinished):
+        if failed == 0:
+            os.remove(path)
+    return outputs
@@ -0,0 +1,126 @@
+import re
+
+# ========== 本地公式定界符规范化 ==========
+# 清洗提示词要求的改写大多是机械的：\(..\)、\[..\]、(\boxed{..}) 改成 $$..$$。
+# 这里从左到右扫描一遍完成这些改写（线性时间），只有拿不准的字符串才交给大模型：
+#   - 定界符没有闭合、(\boxed{ 的括号不配对
+#   - 公式定界符之外还有 \frac、\times 之类的命令（公式边界需要理解上下文才能确定）
+# 已经是 $..$ / $$..$$ 的公式原样保留。
+# 另外提供 prose_unchanged() 检查大模型的回复：两边只去掉公式定界符（$ $$ \( \) \[ \]，以及
+# (\boxed{..}) 外层的括号）和空白，其余文字（正文、数字、英文、标点和公式内容）必须逐字一致，
+# 否则说明模型改动了公式之外的内容，回复作废。
+
+TOKEN = re.compile(r"\$\$|\$|\\\(|\\\[|[(（]\s*\\boxed\{")
+CLOSERS = {"\\(": "\\)", "\\[": "\\]"}
+MATH_COMMAND = re.compile(r"\\[A-Za-z]+|\\\\")
+DELIMITER = re.compile(r"\$\$|\$|\\[()\[\]]|\s+")
+
+
+def _match_brace(text: str, open_pos: int) -> int:
+    """text[open_pos] 为 "{"，返回与之配对的 "}" 的下标；不配对返回 -1。"""
+    depth = 0
+    i = open_pos
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\":
+            i += 2  # 跳过 \{ \} 等转义
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+def segments(text: str):
+    """把文本切成 (类型, 原文, 规范化后) 片段，类型为 prose / math / broken（未闭合，延续到结尾）。"""
+    pos = 0
+    n = len(text)
+    while pos < n:
+        m = TOKEN.search(text, pos)
+        if m is None:
+            yield "prose", text[pos:], text[pos:]
+            return
+        if m.start() > pos:
+            yield "prose", text[pos:m.start()], text[pos:m.start()]
+
+        token = m.group()
+        if token in ("$$", "$"):
+            end = text.find(token, m.end())
+            if end < 0:
+                yield "broken", text[m.start():], text[m.start():]
+                return
+            span = text[m.start():end + len(token)]
+            yield "math", span, span
+            pos = end + len(token)
+        elif token in CLOSERS:
+            end = text.find(CLOSERS[token], m.end())
+            if end < 0:
+                yield "broken", text[m.start():], text[m.start():]
+                return
+            yield "math", text[m.start():end + 2], "$$" + text[m.end():end] + "$$"
+            pos = end + 2
+        else:
+            # (\boxed{...}) / （\boxed{...}）
+            close = _match_brace(text, m.end() - 1)
+            k = close + 1
+            while 0 < k < n and text[k] in " \t":
+                k += 1
+            if close < 0 or k >= n or text[k] not in ")）":
+                yield "broken", text[m.start():], text[m.start():]
+                return
+            boxed = text[text.index("\\boxed", m.start()):close + 1]
+            yield "math", text[m.start():k + 1], "$$" + boxed + "$$"
+            pos = k + 1
+
+
+def normalize(text: str):
+    """-> (规范化后的文本, 是否需要交给大模型)。"""
+    out = []
+    ambiguous = False
+    for kind, source, fixed in segments(text):
+        if kind == "broken" or (kind == "prose" and "\\" in source and MATH_COMMAND.search(source)):
+            ambiguous = True
+        out.append(fixed)
+    return "".join(out), ambiguous
+
+
+def prose_signature(text: str) -> str:
+    """去掉公式定界符和空白后的全文；公式统一按规范化后的 $$..$$ 形式处理。"""
+    text = "".join(fixed if kind == "math" else source for kind, source, fixed in segments(text))
+    return DELIMITER.sub("", text)
+
+
+def prose_unchanged(original: str, fixed: str) -> bool:
+    return bool(fixed.strip()) and prose_signature(original) == prose_signature(fixed)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    from json_stream import iter_strings
+
+    parser = argparse.ArgumentParser(description="统计教师数据中可以在本地完成公式定界符规范化的字段比例和处理速度")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="输入的 JSON 文件名，如 data_T001.json")
+    args = parser.parse_args()
+
+    texts = []
+    for file in args.file:
+        with open(file, "r", encoding="utf-8") as f:
+            texts.extend(iter_strings(json.load(f)))
+    size = sum(len(t.encode("utf-8")) for t in texts)
+
+    start = time.perf_counter()
+    results = [normalize(t) for t in texts]
+    elapsed = time.perf_counter() - start
+
+    changed = sum(1 for t, (r, _) in zip(texts, results) if r != t)
+    ambiguous = sum(1 for _, a in results if a)
+    print(f"✅ {len(texts)} 个字符串（{size / 1e6:.1f} MB），本地改写 {changed} 个，需交给大模型 {ambiguous} 个，"
+          f"耗时 {elapsed:.2f}s（{size / 1e6 / elapsed:.1f} MB/s）")
@@ -0,0 +1,208 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# ========== 多教师并发压测 ==========
+# 用 Streamlit 自带的无界面 AppTest 在同一进程内模拟 N 位教师同时使用 app.py：
+# 从入口页输入教师编号登录 → 逐条翻页 → 拖动滑块、勾选单选、完成偏好排序 → 导出评分。
+# 所有模拟会话共享进程内的数据缓存和渲染缓存，与真实的单进程服务一致。
+# AppTest 每次运行都会创建并销毁全局 Runtime，不能在多线程里同时运行，因此各教师线程
+# 通过一把锁轮流执行重跑：真实服务中脚本重跑同样受 GIL 约束，基本也是串行占用 CPU。
+# 每次重跑记录两个耗时：service = 脚本本身执行时间，response = 排队等待 + 执行，
+# 后者即 N 位教师同时操作时单次点击的实际等待时间。
+#
+# 用法：python load_test.py --teachers 1 10 50 --pages 5
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DISPLAY_IDS = ["T000", "T7900", "T2698", "T8347", "T7567", "T2131", "T6286"]
+
+_run_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """当前进程常驻内存（MB）；无法获取时返回 None。"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def db_files_state(db_path: str):
+    """评分库及其 WAL / SHM 文件的 (大小, mtime)，用于确认压测没有碰正式评分库。"""
+    state = []
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        try:
+            st = os.stat(path)
+            state.append((st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            state.append(None)
+    return state
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def find_button(at, label):
+    for b in at.button:
+        if b.label == label:
+            return b
+    raise LookupError(f"页面上没有按钮：{label}")
+
+
+class SimulatedTeacher:
+    def __init__(self, display_id: str, pages: int, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.display_id = display_id
+        self.pages = pages
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.service = []   # 每次重跑的执行耗时（毫秒）
+        self.response = []  # 每次重跑的排队 + 执行耗时（毫秒）
+        self.errors = []
+
+    def run(self):
+        requested = time.perf_counter()
+        with _run_lock:
+            started = time.perf_counter()
+            self.at.run()
+            finished = time.perf_counter()
+        self.service.append((finished - started) * 1000)
+        self.response.append((finished - requested) * 1000)
+        if self.at.exception:
+            self.errors.append(self.at.exception[0].message)
+
+    def session(self):
+        at = self.at
+        # ===== 入口页登录 =====
+        self.run()
+        at.text_input[0].input(self.display_id)
+        find_button(at, "开始评估").click()
+        self.run()
+
+        for page in range(self.pages):
+            # ===== 拖动滑块 / 勾选单选 =====
+            if at.slider:
+                slider = at.slider[page % len(at.slider)]
+                slider.set_value(slider.max if slider.value != slider.max else slider.min)
+                self.run()
+            if at.radio:
+                radio = at.radio[page % len(at.radio)]
+                radio.set_value(radio.options[-1] if radio.value != radio.options[-1] else radio.options[0])
+                self.run()
+
+            # ===== 偏好排序 =====
+            if at.multiselect:
+                ranking = at.multiselect[0]
+                if len(ranking.value) < 3:
+                    for option in ranking.options:
+                        if option not in ranking.value:
+                            ranking.select(option)
+                    self.run()
+
+            # ===== 下一条 =====
+            find_button(at, "下一条").click()
+            self.run()
+
+        # ===== 导出 =====
+        find_button(at, "导出所有评分结果").click()
+        self.run()
+
+
+def run_round(n_teachers: int, pages: int, timeout: float):
+    teachers = [
+        SimulatedTeacher(DISPLAY_IDS[i % len(DISPLAY_IDS)], pages, timeout)
+        for i in range(n_teachers)
+    ]
+
+    def worker(teacher):
+        try:
+            teacher.session()
+        except Exception as e:
+            teacher.errors.append(repr(e))
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(t,)) for t in teachers]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - start
+    rss_after = current_rss_mb()
+
+    service = [ms for t in teachers for ms in t.service]
+    response = [ms for t in teachers for ms in t.response]
+    errors = [e for t in teachers for e in t.errors]
+    return {
+        "teachers": n_teachers,
+        "reruns": len(service),
+        "wall_s": wall,
+        "throughput": len(service) / wall if wall else float("nan"),
+        "service": {q: percentile(service, q) for q in (50, 95, 99)},
+        "response": {q: percentile(response, q) for q in (50, 95, 99)},
+        "rss_before": rss_before,
+        "rss_after": rss_after,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟多位教师并发使用评估系统，统计每次重跑的延迟、吞吐量和内存增长")
+    parser.add_argument("--teachers", type=int, nargs="+", default=[1, 10, 50], help="并发教师数，可给多个")
+    parser.add_argument("--pages", type=int, default=5, help="每位教师翻阅的样本数")
+    parser.add_argument("--timeout", type=float, default=120, help="单次重跑超时（秒）")
+    parser.add_argument("--db", type=str, default=None, help="评分库路径（默认使用临时文件，不污染 scores.db）")
+    args = parser.parse_args()
+
+    # app.py 用相对路径读取数据文件
+    os.chdir(os.path.dirname(APP_PATH))
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+
+    import score_store
+    real_db = os.path.abspath(score_store.SCORE_DB_PATH)
+    db_path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="load_test_"), "scores.db"))
+    if db_path == real_db:
+        parser.error(f"--db 不能指向正式评分库 {real_db}")
+    real_before = db_files_state(real_db)
+    # 先按压测路径打开进程内共享的评分存储，app.py 之后调用 get_store() 拿到的就是它
+    store = score_store.get_store(db_path)
+    score_store.SCORE_DB_PATH = db_path
+    print(f"评分库：{store.db_path}")
+
+    for n in args.teachers:
+        r = run_round(n, args.pages, args.timeout)
+        rss = "-"
+        if r["rss_before"] is not None:
+            rss = f"{r['rss_after']:.0f} MB (+{r['rss_after'] - r['rss_before']:.0f} MB)"
+        print(f"===== {n} 位教师 =====")
+        print(f"重跑 {r['reruns']} 次，耗时 {r['wall_s']:.1f}s，吞吐 {r['throughput']:.1f} 次/s，RSS {rss}")
+        for name in ("service", "response"):
+            p = r[name]
+            print(f"  {name:<8} p50 {p[50]:8.1f} ms   p95 {p[95]:8.1f} ms   p99 {p[99]:8.1f} ms")
+        for e in r["errors"][:5]:
+            print("  ⚠️", e)
+        if len(r["errors"]) > 5:
+            print(f"  ⚠️ …… 共 {len(r['errors'])} 个错误")
+
+    if db_files_state(real_db) != real_before:
+        raise RuntimeError(f"压测改动了正式评分库 {real_db}")
+
+
+if __name__ == "__main__":
+    main()
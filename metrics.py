@@ -0,0 +1,134 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ========== 热路径计时 ==========
+# 常开的轻量计时：数据加载、display_part1/2/3、各评分面板、导出等关键步骤用 span() 包起来，
+# 每次重跑再汇总一次总耗时和发出的 markdown 字节数（app.markdown 输出的全部 st.markdown 内容，
+# 不含 caption、表格、控件等其他元素）：
+#   rerun.*            整个脚本的重跑（app.py 入口处的 rerun()）
+#   fragment_rerun.*   只重跑某个 @st.fragment 的局部重跑（不经过入口，由 timed() 记录）
+# 每个指标保留最近 RESERVOIR_SIZE 个样本
+# 用于计算分位数，另外累计总次数和总耗时。管理员页面展示快照，也可以导出到本地文件。
+# Streamlit 每个会话在自己的线程里执行脚本，当前这次重跑的累计值放在 threading.local 中。
+
+RESERVOIR_SIZE = 2048
+
+
+class _Metric:
+    __slots__ = ("count", "total", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+
+_metrics = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def observe(name: str, value: float):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = _Metric()
+        metric.add(value)
+
+
+@contextmanager
+def span(name: str):
+    """记录一段代码的耗时（毫秒）。"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000)
+
+
+def timed(name: str):
+    """函数版 span；放在 @st.fragment 下面，fragment 单独重跑时同样计时，
+    并且这次局部重跑的总耗时和 markdown 字节数记为 fragment_rerun.*。"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if in_rerun():
+                with span(name):
+                    return func(*args, **kwargs)
+            with rerun("fragment_rerun"), span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_rerun() -> bool:
+    """当前线程是否处在一次重跑（整次或局部）之中。"""
+    return getattr(_local, "markdown_bytes", None) is not None
+
+
+def add_markdown_bytes(n: int):
+    current = getattr(_local, "markdown_bytes", None)
+    if current is not None:
+        _local.markdown_bytes = current + n
+
+
+@contextmanager
+def rerun(name: str = "rerun"):
+    """包住一次重跑：记录 <name>.total 总耗时和 <name>.markdown_bytes 本次发出的 markdown 字节数。"""
+    _local.markdown_bytes = 0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(f"{name}.total", (time.perf_counter() - start) * 1000)
+        observe(f"{name}.markdown_bytes", _local.markdown_bytes)
+        _local.markdown_bytes = None
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def snapshot() -> dict:
+    """各指标的次数、均值和 p50 / p95 / p99（耗时单位毫秒，字节指标单位字节）。"""
+    with _lock:
+        items = [(name, m.count, m.total, sorted(m.recent)) for name, m in _metrics.items()]
+    result = {}
+    for name, count, total, values in sorted(items):
+        result[name] = {
+            "count": count,
+            "mean": total / count if count else None,
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+            "max": values[-1] if values else None,
+        }
+    return result
+
+
+def dump(path: str, extra: dict = None) -> str:
+    data = {"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "metrics": snapshot()}
+    if extra:
+        data.update(extra)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
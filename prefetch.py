@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# ========== 相邻样本预取 ==========
+# 当前页面渲染完成后，在后台线程中解码相邻样本（上一条 / 下一条 / 跳转目标附近），
+# 并提前拼好它们的 HTML 片段放进 render_cache，翻页时直接命中缓存。
+# 后台线程只调用 data_store / render_cache，不触碰任何 st.* 接口。
+# 每个会话的预取缓存按字节数限额，超出后淘汰最久未用的样本。
+
+MAX_WORKERS = 2
+SESSION_BUDGET_BYTES = 4 * 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+
+
+def sample_key(dataset, idx):
+    """样本在数据中的位置：(路径, mtime, 下标)；数据文件被替换后 mtime 变化。"""
+    return dataset.path, dataset.mtime, idx
+
+
+class PrefetchCache:
+    """单个会话的预取样本缓存（放在 st.session_state 中）。"""
+
+    def __init__(self, budget_bytes: int = SESSION_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._items = OrderedDict()  # (路径, mtime, 下标) -> (样本, 字节数)
+        self._bytes = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, dataset, idx):
+        """取第 idx 条样本：预取过则直接返回，否则同步解码。"""
+        key = sample_key(dataset, idx)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        return dataset[idx]
+
+    def _put(self, key, sample, nbytes):
+        with self._lock:
+            self._pending.discard(key)
+            if key in self._items or nbytes > self.budget_bytes:
+                return
+            self._items[key] = (sample, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.budget_bytes:
+                _, (_, old_bytes) = self._items.popitem(last=False)
+                self._bytes -= old_bytes
+
+    def schedule(self, dataset, targets, prerender=None):
+        """targets: [(下标, 模型混淆映射)]；prerender(sample, model_map, sample_key) 负责预先拼好页面片段。"""
+        for idx, model_map in targets:
+            if not 0 <= idx < len(dataset):
+                continue
+            key = sample_key(dataset, idx)
+            with self._lock:
+                if key in self._items or key in self._pending:
+                    continue
+                self._pending.add(key)
+            _executor.submit(self._load, dataset, idx, key, model_map, prerender)
+
+    def _load(self, dataset, idx, key, model_map, prerender):
+        try:
+            sample = dataset[idx]
+            if prerender is not None:
+                prerender(sample, model_map, key)
+            self._put(key, sample, dataset.sample_nbytes(idx))
+        except Exception as e:
+            with self._lock:
+                self._pending.discard(key)
+            print("预取失败：", idx, e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
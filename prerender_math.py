@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import re
+
+from json_stream import iter_strings
+from render_cache import LATEX_PATTERN, math_table_path
+
+# ========== 公式离线预渲染 ==========
+# 把教师数据中的 $...$ / $$...$$ 公式一次性转换成 MathML，写到数据文件旁的 data_Txxx.math.json，
+# app.py 拼页面片段时直接使用（见 render_cache.load_math_table），浏览器不必在每次重渲染时排版。
+# 公式的识别规则与页面一致（render_cache.LATEX_PATTERN）。转换失败或含有转换器不认识的命令的公式
+# 不写入公式表，页面上仍以原始 TeX 显示。
+#
+# 依赖 latex2mathml（纯 Python，仅本脚本需要）：pip install latex2mathml
+# 用法：python prerender_math.py --file data_T001.json data_T002.json
+
+try:
+    from latex2mathml.converter import convert
+except ImportError:
+    convert = None
+
+DELIMITED = re.compile(r"(\${1,2})(.*?)\${1,2}", re.DOTALL)
+UNKNOWN_COMMAND = re.compile(r">\\[A-Za-z]+<")  # latex2mathml 把不认识的命令原样放进 <mi>
+
+
+def collect_formulas(samples) -> set:
+    formulas = set()
+    for text in iter_strings(samples):
+        if "$" in text:
+            formulas.update(m.group(0) for m in LATEX_PATTERN.finditer(text))
+    return formulas
+
+
+def to_mathml(formula: str):
+    """单个公式（含定界符）转 MathML；失败返回 None。"""
+    m = DELIMITED.fullmatch(formula)
+    if m is None or not m.group(2).strip():
+        return None
+    display = "block" if m.group(1) == "$$" else "inline"
+    try:
+        mathml = convert(m.group(2).strip(), display=display)
+    except Exception:
+        return None
+    if UNKNOWN_COMMAND.search(mathml):
+        return None
+    # HTML 中的 <math> 不需要命名空间，display 默认就是 inline
+    return mathml.replace(' xmlns="http://www.w3.org/1998/Math/MathML"', "").replace(' display="inline"', "")
+
+
+def prerender_file(json_path: str) -> dict:
+    """为一个数据文件生成公式表，返回统计信息。"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        samples = json.load(f)
+
+    formulas = collect_formulas(samples)
+    table = {}
+    failed = []
+    for formula in sorted(formulas):
+        mathml = to_mathml(formula)
+        if mathml is None:
+            failed.append(formula)
+        else:
+            table[formula] = mathml
+
+    out_path = math_table_path(json_path)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "source_mtime": os.stat(json_path).st_mtime_ns,
+            "formulas": table,
+            "failed": failed,
+        }, f, ensure_ascii=False)
+    os.replace(tmp_path, out_path)
+    return {"path": out_path, "total": len(formulas), "converted": len(table), "failed": failed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把教师数据中的 LaTeX 公式预先转换为 MathML，供页面直接使用")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="输入的 JSON 文件名，如 data_T001.json")
+    parser.add_argument("--show-failed", type=int, default=5, help="每个文件最多列出多少个转换失败的公式")
+    args = parser.parse_args()
+
+    if convert is None:
+        raise SystemExit("❌ 需要先安装 latex2mathml：pip install latex2mathml")
+
+    for file in args.file:
+        result = prerender_file(file)
+        print(f"✅ {file}：共 {result['total']} 个公式，转换 {result['converted']} 个，"
+              f"失败 {len(result['failed'])} 个（保留原始 TeX），已生成 {result['path']}")
+        for formula in result["failed"][:args.show_failed]:
+            print("   ⚠️", formula[:80])
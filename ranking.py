@@ -0,0 +1,201 @@
+import argparse
+import sqlite3
+import threading
+
+import numpy as np
+
+from score_model import MODELS, RANK_DIMENSION
+from score_tables import MODEL_NAMES
+
+# ========== 偏好排序 -> Bradley–Terry 强度 ==========
+# part1 的“整体偏好排序”为每个样本的三个模型记 3/2/1 名次，每个完整排序拆成 3 组两两比较。
+# 所有比较累计成胜场矩阵 wins[i, j]（模型 i 胜过 j 的次数），用 MM 算法拟合 Bradley–Terry 强度：
+#   p_i ← W_i / Σ_j n_ij / (p_i + p_j)
+# 胜场矩阵按教师分别保存（[教师 × 模型 × 模型]），所有教师和全局的拟合一起按批量矩阵运算迭代。
+# 新的排序到达时只增减对应样本的胜场，再从上一次的强度出发继续迭代（通常几步就收敛），
+# 不必从头重新拟合。每对模型额外加 PRIOR 场虚拟比较，避免某个模型全胜 / 全负时强度发散。
+#
+# 离线用法：python ranking.py --file 评分结果_T00*.csv
+# 在线使用：管理员页面通过 get_leaderboard() 读取评分库，按 sample_progress.last_at 增量刷新。
+
+PRIOR = 0.5
+MAX_ITER = 500
+TOL = 1e-10
+
+
+def pairwise_wins(ranks) -> np.ndarray:
+    """名次数组 [..., 模型]（越大越好）-> 胜场矩阵 [模型 × 模型]。"""
+    ranks = np.asarray(ranks, dtype=np.float64).reshape(-1, len(MODELS))
+    return (ranks[:, :, None] > ranks[:, None, :]).sum(axis=0).astype(np.float64)
+
+
+def fit_bradley_terry(wins, init=None, max_iter=MAX_ITER, tol=TOL):
+    """胜场矩阵 [..., M, M] -> 强度 [..., M]（几何平均归一为 1）；init 为上一次的强度（热启动）。"""
+    wins = np.asarray(wins, dtype=np.float64)
+    m = wins.shape[-1]
+    off_diag = 1.0 - np.eye(m)
+    w = wins + PRIOR * off_diag
+    games = w + np.swapaxes(w, -1, -2)
+    total_wins = w.sum(axis=-1)
+    p = np.ones(wins.shape[:-1]) if init is None else np.array(init, dtype=np.float64)
+    for _ in range(max_iter):
+        denom = (games / (p[..., :, None] + p[..., None, :])).sum(axis=-1)
+        new = total_wins / denom
+        new /= np.exp(np.log(new).mean(axis=-1, keepdims=True))
+        if np.max(np.abs(new - p)) < tol:
+            return new
+        p = new
+    return p
+
+
+def win_probability(strengths) -> np.ndarray:
+    """强度 -> 对“平均模型”（强度 1）的胜率。"""
+    strengths = np.asarray(strengths)
+    return strengths / (strengths + 1.0)
+
+
+class BradleyTerryBoard:
+    """按教师和全局维护胜场矩阵与强度，支持增量更新。"""
+
+    def __init__(self):
+        self.teachers = []
+        self._teacher_index = {}
+        self.wins = np.zeros((0, len(MODELS), len(MODELS)))
+        self.strengths = np.ones((0, len(MODELS)))
+        self.global_strengths = np.ones(len(MODELS))
+        self._rankings = {}  # (教师, poid) -> 已计入的名次
+        self._lock = threading.Lock()
+
+    def _teacher(self, teacher_id):
+        idx = self._teacher_index.get(teacher_id)
+        if idx is None:
+            idx = self._teacher_index[teacher_id] = len(self.teachers)
+            self.teachers.append(teacher_id)
+            self.wins = np.concatenate([self.wins, np.zeros((1, len(MODELS), len(MODELS)))])
+            self.strengths = np.concatenate([self.strengths, np.ones((1, len(MODELS)))])
+        return idx
+
+    def update(self, rankings: dict) -> int:
+        """rankings: {(教师, poid): [A, B, C 的名次] 或 None（撤销）}；返回实际变化的样本数。"""
+        with self._lock:
+            touched = set()
+            for (teacher_id, poid), ranks in rankings.items():
+                ranks = None if ranks is None else tuple(ranks)
+                if ranks is not None and sorted(ranks) != list(range(1, len(MODELS) + 1)):
+                    ranks = None  # 未排满或名次重复，不计入
+                old = self._rankings.get((teacher_id, poid))
+                if old == ranks:
+                    continue
+                t = self._teacher(teacher_id)
+                if old is not None:
+                    self.wins[t] -= pairwise_wins(old)
+                if ranks is not None:
+                    self.wins[t] += pairwise_wins(ranks)
+                    self._rankings[(teacher_id, poid)] = ranks
+                else:
+                    self._rankings.pop((teacher_id, poid), None)
+                touched.add(t)
+
+            if touched:
+                idx = sorted(touched)
+                self.strengths[idx] = fit_bradley_terry(self.wins[idx], self.strengths[idx])
+                self.global_strengths = fit_bradley_terry(self.wins.sum(axis=0), self.global_strengths)
+            return len(touched)
+
+    def comparisons(self, t=None) -> int:
+        wins = self.wins.sum(axis=0) if t is None else self.wins[t]
+        return int(wins.sum())
+
+    def table(self) -> list:
+        """排行榜：全局一行一个模型，按强度从高到低；另附每位教师的强度。"""
+        with self._lock:
+            order = np.argsort(-self.global_strengths)
+            rows = []
+            for rank, m in enumerate(order, start=1):
+                row = {
+                    "名次": rank,
+                    "模型": MODEL_NAMES[m],
+                    "BT 强度": round(float(self.global_strengths[m]), 3),
+                    "对平均模型胜率": f"{win_probability(self.global_strengths[m]):.1%}",
+                }
+                for t, teacher_id in enumerate(self.teachers):
+                    row[teacher_id] = round(float(self.strengths[t, m]), 3)
+                rows.append(row)
+            return rows
+
+
+# ========== 在线排行榜（读取评分库） ==========
+REFRESH_OVERLAP = 5.0  # 秒；多进程写入时时间戳可能略晚于提交顺序，重叠读取一段保证不漏
+
+RANK_ROWS = """
+SELECT model, value FROM scores
+WHERE teacher_id = ? AND poid = ? AND part = 'part1' AND item = '' AND dimension = ?
+"""
+
+
+class LiveLeaderboard:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.board = BradleyTerryBoard()
+        self._watermark = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """只读取上次刷新后有新评分的样本（sample_progress.last_at），返回排序有变化的样本数。"""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            try:
+                touched = conn.execute(
+                    "SELECT teacher_id, poid, last_at FROM sample_progress WHERE last_at >= ?",
+                    (self._watermark - REFRESH_OVERLAP,),
+                ).fetchall()
+                rankings = {}
+                for teacher_id, poid, _ in touched:
+                    ranks = dict(conn.execute(RANK_ROWS, (teacher_id, poid, RANK_DIMENSION)).fetchall())
+                    rankings[(teacher_id, poid)] = [int(ranks.get(m) or 0) for m in MODELS]
+            finally:
+                conn.close()
+            if touched:
+                self._watermark = max(self._watermark, max(row[2] for row in touched))
+            return self.board.update(rankings)
+
+
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard(db_path: str) -> LiveLeaderboard:
+    """进程内共享的在线排行榜（首次调用时从评分库全量读取一次）。"""
+    global _leaderboard
+    with _leaderboard_lock:
+        if _leaderboard is None or _leaderboard.db_path != db_path:
+            _leaderboard = LiveLeaderboard(db_path)
+        return _leaderboard
+
+
+# ========== 离线：从导出 CSV 计算 ==========
+def board_from_exports(paths) -> BradleyTerryBoard:
+    from score_tables import load_exports
+
+    table = load_exports(paths)
+    rows = table.groups().get(("part1", RANK_DIMENSION), np.array([], dtype=np.int64))
+    rankings = {}
+    for r in rows:
+        unit = table.units[table.unit[r]]
+        key = (table.teachers[table.teacher[r]], unit[0])
+        rankings.setdefault(key, [0] * len(MODELS))[table.model[r]] = int(table.values[r])
+    board = BradleyTerryBoard()
+    board.update(rankings)
+    return board
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="根据整体偏好排序拟合 Bradley–Terry 模型强度（全局和每位教师）")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="各教师导出的评分 CSV")
+    args = parser.parse_args()
+
+    board = board_from_exports(args.file)
+    print(f"✅ {len(board.teachers)} 位教师，{board.comparisons()} 次两两比较")
+    for row in board.table():
+        teachers = "  ".join(f"{t} {row[t]:6.3f}" for t in board.teachers)
+        print(f"{row['名次']}. {row['模型']:<12} 强度 {row['BT 强度']:6.3f}  胜率 {row['对平均模型胜率']:>6}  | {teachers}")
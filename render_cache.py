@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# ========== 渲染缓存 ==========
+# 同一样本（同一 poid、同一模型混淆顺序）的题目、答案和对话面板在每次重跑时都完全相同，
+# 这里把拼好的 HTML / markdown 片段缓存起来，所有会话共享。
+# 缓存键必须比重新拼片段便宜（拼一个片段只要几微秒），因此不对内容做序列化和哈希：
+#   文本片段     直接以字符串为键（str 的哈希值缓存在对象上，同一对象重复查找几乎不花时间）
+#   单轮对话面板 以 (学生发言, 模型回复, 模型名, 高度) 元组为键
+#   多轮对话     轮次列表不可哈希，由调用方给出位置键 slot：(数据文件, mtime, 样本下标, 面板位置, 真实模型)，
+#               数据文件被替换后 mtime 变化，旧片段随 LRU 淘汰
+# 公式表更新时 _math_version 变化，所有键随之失效。
+
+MAX_ENTRIES = 2048  # 每条样本约 25 个片段，含各会话预取的相邻样本
+
+LATEX_PATTERN = re.compile(r"(\${1,2}.*?\${1,2})")
+
+# 滑动对话框模板（与页面原有排版逐字一致，缩进会影响 markdown 解析，不要改动）
+PANEL_TEMPLATE = """
+                <div style='height: {height}px; overflow-y: auto; padding-right:10px; border: 1px solid #ccc; border-radius: 10px; padding: 10px; background-color: #f9f9f9;'>
+                {content}
+                </div>
+                """
+
+SINGLE_PANEL_TEMPLATE = """
+                <div style='height: {height}px; overflow-y: auto; padding-right:10px;
+                            border: 1px solid #ccc; border-radius: 10px;
+                            padding: 10px; background-color: #f9f9f9;'>
+                {content}
+                </div>
+                """
+
+# part1 多模型对话表：一个滑动框内每轮一行、每个模型一列，第 i 轮在各模型间并排对齐、一起滚动。
+# 单元格内容前后留空行，才会按 markdown 解析（公式）；标签不能缩进，否则会被当成代码块
+DIALOG_TABLE_TEMPLATE = (
+    "<div style='height: {height}px; overflow-y: auto; border: 1px solid #ccc; border-radius: 10px; "
+    "padding: 0 10px 10px 10px; background-color: #f9f9f9;'>\n"
+    "<table style='width: 100%; table-layout: fixed; border-collapse: collapse;'>\n"
+    "<tr>{header}</tr>\n"
+    "{rows}"
+    "</table>\n"
+    "</div>"
+)
+DIALOG_TABLE_HEADER = ("<th style='text-align: left; padding: 8px; position: sticky; top: 0; "
+                       "background-color: #f9f9f9;'>🤖 {name}</th>")
+DIALOG_TABLE_CELL = ("<td style='vertical-align: top; padding: 8px; border-top: 1px solid #ddd;'>\n\n"
+                     "{content}\n\n</td>\n")
+
+USER_LABEL = "<span style='color:#1f77b4; font-weight:bold;'>学生：</span><br>"
+MODEL_LABEL = "<span style='color:#d62728; font-weight:bold;'>{name}：</span><br>"
+
+
+class LRURenderCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = builder()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "bytes": sum(len(v) for v in self._items.values()),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_cache = LRURenderCache()
+
+
+def cache_stats() -> dict:
+    return {**_cache.stats(), "math_formulas": len(_math), "math_files": len(_math_files)}
+
+
+# ========== 预渲染公式 ==========
+# prerender_math.py 离线把数据里的 $...$ / $$...$$ 转成 MathML，写到数据文件旁的
+# data_Txxx.math.json（公式原文 -> MathML）。页面拼片段时直接换成 MathML，浏览器原生显示，
+# 不必每次重渲染都重新排版；表里没有的公式（转换失败或数据更新后新增的）保留原始 TeX。
+# 公式表按原文取值，与数据文件版本无关，多个数据文件的表可以合并使用。
+MATH_SUFFIX = ".math.json"
+
+_math = {}         # 公式原文（含 $ 定界符） -> MathML
+_math_files = {}   # 公式表路径 -> 已加载的 mtime
+_math_lock = threading.Lock()
+_math_version = 0
+
+
+def math_table_path(json_path: str) -> str:
+    base = json_path[:-len(".json")] if json_path.endswith(".json") else json_path
+    return base + MATH_SUFFIX
+
+
+def load_math_table(json_path: str) -> int:
+    """加载数据文件对应的公式表（不存在时忽略），返回当前可用的公式数。"""
+    global _math_version
+    path = os.path.abspath(math_table_path(json_path))
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return len(_math)
+    if _math_files.get(path) == mtime:
+        return len(_math)
+
+    with _math_lock:
+        if _math_files.get(path) != mtime:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    formulas = json.load(f)["formulas"]
+            except (OSError, ValueError, KeyError) as e:
+                print("公式表读取失败：", path, e)
+                formulas = {}
+            _math.update(formulas)
+            _math_files[path] = mtime
+            _math_version += 1
+    return len(_math)
+
+
+def with_math(text: str) -> str:
+    if not _math:
+        return text
+    return LATEX_PATTERN.sub(lambda m: _math.get(m.group(0), m.group(0)), text)
+
+
+# ========== 片段构建 ==========
+def build_textblock(text: str) -> str:
+    # 公式部分保留 $ 符号交给 markdown 渲染，其余部分把换行转成 <br>
+    return "".join(
+        _math.get(part, part) if part.startswith("$") else part.replace("\n", "<br>")
+        for part in LATEX_PATTERN.split(text)
+    )
+
+
+def _turn_blocks(turn: dict, name: str, skip_user: bool) -> list:
+    blocks = []
+    if "user" in turn and not skip_user:
+        blocks.append(USER_LABEL + with_math(turn["user"]))
+    if "model_respond" in turn:
+        blocks.append(MODEL_LABEL.format(name=name) + with_math(turn["model_respond"]))
+    return blocks
+
+
+def build_dialog_panel(turns: list, name: str, height: int, skip_first_user: bool = False) -> str:
+    blocks = [" "]
+    for idx, turn in enumerate(turns):
+        blocks.extend(_turn_blocks(turn, name, skip_first_user and idx == 0))
+        if idx < len(turns) - 1:
+            blocks.append("---")
+    return PANEL_TEMPLATE.format(height=height, content="\n\n".join(blocks))
+
+
+def build_dialog_table(model_turns: list, names: list, height: int, skip_first_user: bool = False) -> str:
+    """model_turns[j] 是第 j 个模型的轮次列表；第 i 行放各模型的第 i 轮，轮数不足的模型留空。"""
+    rows = []
+    for idx in range(max((len(t) for t in model_turns), default=0)):
+        cells = []
+        for turns, name in zip(model_turns, names):
+            blocks = _turn_blocks(turns[idx], name, skip_first_user and idx == 0) if idx < len(turns) else []
+            cells.append(DIALOG_TABLE_CELL.format(content="\n\n".join(blocks) or "&nbsp;"))
+        rows.append("<tr>\n" + "".join(cells) + "</tr>\n")
+    header = "".join(DIALOG_TABLE_HEADER.format(name=name) for name in names)
+    return DIALOG_TABLE_TEMPLATE.format(height=height, header=header, rows="".join(rows))
+
+
+def build_single_panel(user_text: str, model_text: str, name: str, height: int = 250) -> str:
+    blocks = ["", USER_LABEL + with_math(user_text), MODEL_LABEL.format(name=name) + with_math(model_text)]
+    return SINGLE_PANEL_TEMPLATE.format(height=height, content="\n\n".join(blocks))
+
+
+# ========== 带缓存的入口 ==========
+def textblock(text: str) -> str:
+    return _cache.get_or_build(("text", _math_version, text), lambda: build_textblock(text))
+
+
+def dialog_panel(turns: list, slot: tuple, name: str, height: int, skip_first_user: bool = False) -> str:
+    """slot：这组轮次在数据中的位置，同一 slot 的轮次内容必须相同；只显示前几轮时轮数也计入键。"""
+    key = ("dialog", _math_version, slot, len(turns), name, height, skip_first_user)
+    return _cache.get_or_build(key, lambda: build_dialog_panel(turns, name, height, skip_first_user))
+
+
+def dialog_table(model_turns: list, slot: tuple, names: list, height: int, skip_first_user: bool = False) -> str:
+    """slot 含义同 dialog_panel（需包含各列对应的真实模型）；各模型显示的轮数计入键。"""
+    key = ("dialog_table", _math_version, slot, tuple(len(t) for t in model_turns), tuple(names), height, skip_first_user)
+    return _cache.get_or_build(key, lambda: build_dialog_table(model_turns, names, height, skip_first_user))
+
+
+def single_panel(user_text: str, model_text: str, name: str, height: int = 250) -> str:
+    key = ("single", _math_version, user_text, model_text, name, height)
+    return _cache.get_or_build(key, lambda: build_single_panel(user_text, model_text, name, height))
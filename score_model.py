@@ -0,0 +1,164 @@
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+
+# ========== 评分数据模型 ==========
+# 每条评分是一条 ScoreRecord：(教师, poid, part, item, dimension, 模型, 分值)
+#   part1: item = ""，dimension = 评分维度名
+#   part2: item = 该样本内 part2 块的序号，dimension = 块类型（1/2/3）
+#   part3: item = question_id，dimension = 评分项序号（0/1）
+# 每个样本的每个 part 对应一个 [行 × 模型 A/B/C] 的浮点矩阵，NaN 表示尚未评分，
+# 完成度检查、导出和汇总都直接在矩阵上做向量化运算。
+
+MODELS = ["A", "B", "C"]
+MODEL_INDEX = {m: i for i, m in enumerate(MODELS)}
+PARTS = ["part1", "part2", "part3"]
+
+RANK_DIMENSION = "整体偏好排序（主观倾向）"
+PART1_DIMENSIONS = [
+    RANK_DIMENSION,
+    "最终答案正确",
+    "过程正确",
+    "提问质量",
+    "语言流畅度",
+    "是否指出知识点",
+    "知识点内容是否正确",
+    "是否分步讲解",
+]
+
+
+class ScoreRecord(NamedTuple):
+    teacher_id: str
+    poid: str
+    part: str
+    item: str
+    dimension: str
+    model: str
+    value: float
+
+
+class ScoreMatrix:
+    """一个样本某个 part 的评分：行为 (item, dimension)，列为模型 A/B/C。"""
+
+    def __init__(self, row_keys=()):
+        self.row_keys = list(row_keys)
+        self.row_index = {k: i for i, k in enumerate(self.row_keys)}
+        self.values = np.full((len(self.row_keys), len(MODELS)), np.nan)
+
+    def row(self, key) -> int:
+        idx = self.row_index.get(key)
+        if idx is None:
+            idx = len(self.row_keys)
+            self.row_keys.append(key)
+            self.row_index[key] = idx
+            self.values = np.vstack([self.values, np.full((1, len(MODELS)), np.nan)])
+        return idx
+
+    def filled_rows(self):
+        """至少有一个模型已评分的行。"""
+        mask = ~np.all(np.isnan(self.values), axis=1)
+        return [(self.row_keys[i], self.values[i]) for i in np.flatnonzero(mask)]
+
+
+class SampleScores:
+    def __init__(self):
+        self.parts = {
+            "part1": ScoreMatrix((("", d) for d in PART1_DIMENSIONS)),
+            "part2": ScoreMatrix(),
+            "part3": ScoreMatrix(),
+        }
+
+    def rank_complete(self) -> bool:
+        ranks = self.parts["part1"].values[0]
+        return bool(np.all(ranks > 0))
+
+
+def to_python(value):
+    """矩阵中的浮点值转回导出 / 控件用的 Python 数值；未评分返回 None。"""
+    if value is None or np.isnan(value):
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class ScoreBook:
+    """一位教师的全部评分：poid -> SampleScores。"""
+
+    def __init__(self, teacher_id: str, on_change=None):
+        self.teacher_id = teacher_id
+        self.samples = {}
+        # 分值变化时的回调（写入评分库），签名同 ScoreStore.record；
+        # 控件每次重跑都会 set 一遍，值没变时不回调，评分库不必再记一份去重用的旧值
+        self.on_change = on_change
+
+    def _sample(self, poid: str) -> SampleScores:
+        sample = self.samples.get(poid)
+        if sample is None:
+            sample = self.samples[poid] = SampleScores()
+        return sample
+
+    def get(self, part: str, poid: str, item, dimension, model: str, default=None):
+        sample = self.samples.get(poid)
+        if sample is None:
+            return default
+        matrix = sample.parts[part]
+        idx = matrix.row_index.get((str(item), str(dimension)))
+        if idx is None:
+            return default
+        value = to_python(matrix.values[idx, MODEL_INDEX[model]])
+        return default if value is None else value
+
+    def set(self, part: str, poid: str, item, dimension, model: str, value):
+        item, dimension = str(item), str(dimension)
+        matrix = self._sample(poid).parts[part]
+        row = matrix.row((item, dimension))  # 新行会替换 matrix.values，先取行号
+        col = MODEL_INDEX[model]
+        old = matrix.values[row, col]
+        matrix.values[row, col] = value
+        new = matrix.values[row, col]
+        if new == old or (np.isnan(new) and np.isnan(old)):
+            return
+        if self.on_change is not None:
+            self.on_change(self.teacher_id, poid, part, item, dimension, model, value)
+
+    def load_records(self, records):
+        """从评分库恢复（不触发 on_change）。"""
+        for r in records:
+            matrix = self._sample(r.poid).parts[r.part]
+            row = matrix.row((r.item, r.dimension))
+            matrix.values[row, MODEL_INDEX[r.model]] = r.value
+
+    def records(self):
+        for poid, sample in self.samples.items():
+            for part in PARTS:
+                for (item, dimension), row in sample.parts[part].filled_rows():
+                    for m, value in zip(MODELS, row):
+                        if not np.isnan(value):
+                            yield ScoreRecord(self.teacher_id, poid, part, item, dimension, m, to_python(value))
+
+    # ---------- 向量化汇总 ----------
+    def part1_tensor(self):
+        """返回 (poid 列表, [样本 × 维度 × 模型] 数组)。"""
+        poids = list(self.samples)
+        if not poids:
+            return poids, np.empty((0, len(PART1_DIMENSIONS), len(MODELS)))
+        return poids, np.stack([self.samples[p].parts["part1"].values for p in poids])
+
+    def completed_poids(self) -> set:
+        """已完成偏好排序（三个模型都有名次）的样本。"""
+        poids, tensor = self.part1_tensor()
+        done = np.all(tensor[:, 0, :] > 0, axis=1)
+        return {p for p, ok in zip(poids, done) if ok}
+
+    def part1_means(self, poids=None):
+        """各维度 × 模型的平均分（忽略未评分），形状 [维度 × 模型]。"""
+        all_poids, tensor = self.part1_tensor()
+        if poids is not None:
+            tensor = tensor[np.array([p in poids for p in all_poids], dtype=bool).reshape(-1)]
+        if tensor.shape[0] == 0:
+            return np.full((len(PART1_DIMENSIONS), len(MODELS)), np.nan)
+        with warnings.catch_warnings():
+            # 某个维度在所有样本上都未评分时 nanmean 返回 NaN 并告警
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            return np.nanmean(tensor, axis=0)
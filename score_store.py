@@ -0,0 +1,274 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+from score_model import MODELS, RANK_DIMENSION, ScoreBook, ScoreRecord
+
+# ========== 评分持久化（SQLite，WAL 模式） ==========
+# 评分簿（score_model.ScoreBook）只在分值变化时调用 record()，这里把变化记在内存中（微秒级），
+# 由后台线程按 FLUSH_INTERVAL 批量写入数据库，写入后即从内存中移除，不随教师数和评分数增长。
+# 同一进程内只有这一个写连接，多个教师会话之间不会争抢数据库锁；多进程部署时依靠 WAL + busy_timeout。
+#
+# 每条记录对应一条 score_model.ScoreRecord：(教师, poid, part, item, dimension, 模型)
+#
+# 进度汇总（管理员页面使用）随每批写入增量维护，不从全部评分重新统计：
+#   sample_progress   每位教师每个样本一行：是否已完成偏好排序、完成时间、首次 / 最近评分时间
+#   teacher_progress  每位教师一行：已打开样本数、已完成样本数、首次 / 最近活动时间
+# 每批写入只重新检查本批涉及的样本（按主键前缀查 3 行排序分），再把变化量累加到教师汇总上。
+
+SCORE_DB_PATH = "scores.db"
+FLUSH_INTERVAL = 0.5  # 秒
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    teacher_id TEXT NOT NULL,
+    poid       TEXT NOT NULL,
+    part       TEXT NOT NULL,
+    item       TEXT NOT NULL,
+    dimension  TEXT NOT NULL,
+    model      TEXT NOT NULL,
+    value,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (teacher_id, poid, part, item, dimension, model)
+)
+"""
+
+PROGRESS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sample_progress (
+        teacher_id   TEXT NOT NULL,
+        poid         TEXT NOT NULL,
+        completed    INTEGER NOT NULL,
+        completed_at REAL,
+        first_at     REAL NOT NULL,
+        last_at      REAL NOT NULL,
+        PRIMARY KEY (teacher_id, poid)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS sample_progress_completed_at ON sample_progress (completed_at)",
+    "CREATE INDEX IF NOT EXISTS sample_progress_last_at ON sample_progress (last_at)",
+    """
+    CREATE TABLE IF NOT EXISTS teacher_progress (
+        teacher_id     TEXT PRIMARY KEY,
+        opened         INTEGER NOT NULL,
+        completed      INTEGER NOT NULL,
+        first_activity REAL NOT NULL,
+        last_activity  REAL NOT NULL
+    )
+    """,
+]
+
+UPSERT = """
+INSERT INTO scores (teacher_id, poid, part, item, dimension, model, value, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (teacher_id, poid, part, item, dimension, model)
+DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+"""
+
+
+UPSERT_TEACHER_PROGRESS = """
+INSERT INTO teacher_progress (teacher_id, opened, completed, first_activity, last_activity)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (teacher_id) DO UPDATE SET
+    opened = opened + excluded.opened,
+    completed = completed + excluded.completed,
+    first_activity = MIN(first_activity, excluded.first_activity),
+    last_activity = MAX(last_activity, excluded.last_activity)
+"""
+
+RANKED_MODELS = """
+SELECT COUNT(*) FROM scores
+WHERE teacher_id = ? AND poid = ? AND part = 'part1' AND item = '' AND dimension = ? AND value > 0
+"""
+
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path or SCORE_DB_PATH, timeout=5.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(SCHEMA)
+    for statement in PROGRESS_SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM teacher_progress)").fetchone()[0]:
+        rebuild_progress(conn)
+    return conn
+
+
+def update_progress(conn: sqlite3.Connection, batch: dict):
+    """按本批写入的评分更新进度汇总（在写入评分的同一事务中调用）。"""
+    touched = {}  # (教师, poid) -> 本批 (最早, 最近) 时间戳
+    for (teacher_id, poid, *_), (_, ts) in batch.items():
+        first, last = touched.get((teacher_id, poid), (ts, ts))
+        touched[(teacher_id, poid)] = (min(first, ts), max(last, ts))
+
+    deltas = {}  # 教师 -> [新打开样本数, 新完成样本数, 最早时间, 最近时间]
+    for (teacher_id, poid), (first, ts) in touched.items():
+        ranked = conn.execute(RANKED_MODELS, (teacher_id, poid, RANK_DIMENSION)).fetchone()[0]
+        completed = int(ranked == len(MODELS))
+        old = conn.execute(
+            "SELECT completed, completed_at FROM sample_progress WHERE teacher_id = ? AND poid = ?",
+            (teacher_id, poid),
+        ).fetchone()
+        if old is None:
+            conn.execute(
+                "INSERT INTO sample_progress VALUES (?, ?, ?, ?, ?, ?)",
+                (teacher_id, poid, completed, ts if completed else None, first, ts),
+            )
+            opened, change = 1, completed
+        else:
+            completed_at = (old[1] if old[0] else ts) if completed else None
+            conn.execute(
+                "UPDATE sample_progress SET completed = ?, completed_at = ?, last_at = MAX(last_at, ?) "
+                "WHERE teacher_id = ? AND poid = ?",
+                (completed, completed_at, ts, teacher_id, poid),
+            )
+            opened, change = 0, completed - old[0]
+
+        d = deltas.setdefault(teacher_id, [0, 0, first, ts])
+        d[0] += opened
+        d[1] += change
+        d[2] = min(d[2], first)
+        d[3] = max(d[3], ts)
+
+    conn.executemany(UPSERT_TEACHER_PROGRESS, [(t, *d) for t, d in deltas.items()])
+
+
+def rebuild_progress(conn: sqlite3.Connection):
+    """从全部评分重建进度汇总（仅在旧库首次升级时执行一次）。"""
+    with conn:
+        conn.execute("DELETE FROM sample_progress")
+        conn.execute("DELETE FROM teacher_progress")
+        conn.execute(
+            """
+            INSERT INTO sample_progress
+            SELECT teacher_id, poid, done, CASE WHEN done THEN rank_at END, first_at, last_at FROM (
+                SELECT teacher_id, poid,
+                       SUM(part = 'part1' AND item = '' AND dimension = :rank AND value > 0) = :n AS done,
+                       MAX(CASE WHEN part = 'part1' AND dimension = :rank THEN updated_at END) AS rank_at,
+                       MIN(updated_at) AS first_at,
+                       MAX(updated_at) AS last_at
+                FROM scores GROUP BY teacher_id, poid
+            )
+            """,
+            {"rank": RANK_DIMENSION, "n": len(MODELS)},
+        )
+        conn.execute(
+            """
+            INSERT INTO teacher_progress
+            SELECT teacher_id, COUNT(*), SUM(completed), MIN(first_at), MAX(last_at)
+            FROM sample_progress GROUP BY teacher_id
+            """
+        )
+
+
+class ScoreStore:
+    def __init__(self, db_path: str = None, flush_interval: float = FLUSH_INTERVAL):
+        # 默认路径在调用时读取，压测等场景可以在运行时改 SCORE_DB_PATH
+        self.db_path = db_path or SCORE_DB_PATH
+        self.flush_interval = flush_interval
+        self._conn = connect(self.db_path)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # 主键 -> (值, 时间戳)，等待写入
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="score-store-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- 写入 ----------
+    def record(self, teacher_id: str, poid: str, part: str, item, dimension, model: str, value):
+        pk = (teacher_id, poid, part, str(item), str(dimension), model)
+        with self._lock:
+            self._pending[pk] = (value, time.time())
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+            rows = [(*pk, value, ts) for pk, (value, ts) in batch.items()]
+            try:
+                with self._conn:
+                    self._conn.executemany(UPSERT, rows)
+                    update_progress(self._conn, batch)
+            except sqlite3.Error as e:
+                # 写入失败时放回队列，下次重试（新值优先）
+                print("评分写入失败：", e)
+                with self._lock:
+                    for pk, entry in batch.items():
+                        self._pending.setdefault(pk, entry)
+                return 0
+            return len(rows)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        self._conn.close()
+
+    # ---------- 读取 ----------
+    def load_rows(self, teacher_id: str):
+        self.flush()
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        try:
+            return conn.execute(
+                "SELECT poid, part, item, dimension, model, value FROM scores WHERE teacher_id = ?",
+                (teacher_id,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def load_progress(self, since: float) -> dict:
+        """各教师的进度汇总：{教师: {opened, completed, first_activity, last_activity, recent}}，
+        recent 为 since 之后完成的样本数。"""
+        self.flush()
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        try:
+            progress = {
+                row[0]: dict(zip(("opened", "completed", "first_activity", "last_activity"), row[1:]), recent=0)
+                for row in conn.execute("SELECT * FROM teacher_progress")
+            }
+            for teacher_id, recent in conn.execute(
+                "SELECT teacher_id, COUNT(*) FROM sample_progress WHERE completed_at >= ? GROUP BY teacher_id",
+                (since,),
+            ):
+                if teacher_id in progress:
+                    progress[teacher_id]["recent"] = recent
+            return progress
+        finally:
+            conn.close()
+
+    def load_book(self, teacher_id: str) -> ScoreBook:
+        """恢复一位教师的全部评分；之后对评分簿的修改会自动写回评分库。"""
+        rows = self.load_rows(teacher_id)
+        book = ScoreBook(teacher_id, on_change=self.record)
+        book.load_records(ScoreRecord(teacher_id, *row) for row in rows)
+        return book
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(db_path: str = None) -> ScoreStore:
+    """进程内共享的评分存储（首次调用时打开数据库并启动写线程）。
+    db_path 只在首次调用时生效；已打开其它评分库时抛出 ValueError。"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScoreStore(db_path)
+            atexit.register(_store.close)
+        elif db_path is not None and os.path.abspath(db_path) != os.path.abspath(_store.db_path):
+            raise ValueError(f"评分库已打开为 {_store.db_path}，不能再切换到 {db_path}")
+        return _store
@@ -0,0 +1,94 @@
+import csv
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from export_scores import COLUMNS
+
+# ========== 导出评分表读取 ==========
+# 读取各位教师从页面导出的评分 CSV（export_scores.write_csv 的格式），展开成长表：
+# 每个 (教师, 评分单元, 模型) 一条分值，供一致性分析、置信区间和排序等离线统计使用。
+#   评分单元 = (poid, part, type, dimension, 序号)；同一样本内 type / dimension 都相同的行
+#   （例如同一类型的多道 part3 题目）按出现顺序编号区分。
+#   分组     = (part, dimension)，即 part1 的评分维度、part2 的块类型、part3 的评分项。
+# 教师编号取自导出文件名（评分结果_T001_时间.csv），取不到时使用文件名本身。
+
+SCORE_COLUMNS = COLUMNS[5:]
+MODEL_NAMES = [c[len("score_"):] for c in SCORE_COLUMNS]  # DeepSeek-V3 / o4-mini / Spark_X1
+EXPORT_NAME = re.compile(r"评分结果_([^_]+)_")
+
+
+def teacher_from_path(path: str) -> str:
+    name = os.path.basename(path)
+    m = EXPORT_NAME.match(name)
+    return m.group(1) if m else os.path.splitext(name)[0]
+
+
+class ScoreTable:
+    """长表：values[i] 是教师 teacher[i] 对单元 unit[i] 中模型 model[i] 的分值。"""
+
+    def __init__(self, teachers, units, teacher, unit, model, values):
+        self.teachers = teachers  # 教师编号列表，teacher 数组是其下标
+        self.units = units        # 单元键列表 (poid, part, type, dimension, 序号)，unit 数组是其下标
+        self.teacher = teacher
+        self.unit = unit
+        self.model = model
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def groups(self) -> dict:
+        """(part, dimension) -> 该分组各行的下标数组。"""
+        unit_group = [(u[1], u[3]) for u in self.units]
+        order = {}
+        codes = np.array([order.setdefault(g, len(order)) for g in unit_group], dtype=np.int64)
+        row_codes = codes[self.unit]
+        return {g: np.flatnonzero(row_codes == code) for g, code in order.items()}
+
+    def matrix(self, rows) -> tuple:
+        """选中行 -> (评分对象 × 教师) 分值矩阵（NaN 为未评分）和对应的评分对象编码。
+        评分对象 = 单元 × 模型，编码为 unit * 模型数 + model。"""
+        items, item_idx = np.unique(self.unit[rows] * len(MODEL_NAMES) + self.model[rows], return_inverse=True)
+        mat = np.full((len(items), len(self.teachers)), np.nan)
+        mat[item_idx, self.teacher[rows]] = self.values[rows]
+        return mat, items
+
+    def poid_of(self, item_codes) -> np.ndarray:
+        return np.array([self.units[u][0] for u in np.asarray(item_codes) // len(MODEL_NAMES)])
+
+
+def load_exports(paths) -> ScoreTable:
+    teachers, units = [], {}
+    teacher, unit, model, values = [], [], [], []
+    for path in paths:
+        t = teacher_from_path(path)
+        if t not in teachers:
+            teachers.append(t)
+        t_idx = teachers.index(t)
+        seen = defaultdict(int)
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                base = (row["poid"], row["part"], row["type"], row["dimension"])
+                key = base + (seen[base],)
+                seen[base] += 1
+                u_idx = units.setdefault(key, len(units))
+                for m_idx, col in enumerate(SCORE_COLUMNS):
+                    cell = row.get(col, "")
+                    if cell == "" or cell is None:
+                        continue
+                    teacher.append(t_idx)
+                    unit.append(u_idx)
+                    model.append(m_idx)
+                    values.append(float(cell))
+
+    return ScoreTable(
+        teachers,
+        list(units),
+        np.array(teacher, dtype=np.int64),
+        np.array(unit, dtype=np.int64),
+        np.array(model, dtype=np.int64),
+        np.array(values, dtype=np.float64),
+    )
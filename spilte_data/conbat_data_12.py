@@ -1,7 +1,11 @@
 import json
+import sys
 from pathlib import Path
 from collections import defaultdict
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # 项目根目录，引用 json_stream
+from json_stream import ArrayWriter
+
 # 路径
 part1_path = "D:/VScode/test/spilte_data/part1_filtered_fin.jsonl"
 part2_path = "D:/VScode/test/spilte_data/part2_constructed.jsonl"
@@ -33,39 +37,31 @@ with open(part2_path, "r", encoding="utf-8") as f:
         qid = entry["question_id"]
         part2_grouped[qid].append(entry)
 
-# === 读取 Part3 数据 ===
-part3_entries = []
-with open(part3_path, "r", encoding="utf-8") as f:
-    for line in f:
-        part3_entries.append(json.loads(line))
-
-# === 合并 Part1 + Part2 + Part3（按顺序） ===
-combined = []
+# === 合并 Part1 + Part2 + Part3（按顺序），边生成边写入输出 ===
+# Part3 按行顺序逐条取用，生成的样本直接流式写出，不在内存中攒整个结果列表
 counter = 1
 used_part3 = 0
 
-for qid in part1_data:
-    if qid in part2_grouped and len(part2_grouped[qid]) == 3:
-        if used_part3 < len(part3_entries):
-            part3_item = part3_entries[used_part3]
+with open(part3_path, "r", encoding="utf-8") as part3_file, ArrayWriter(output_path) as out:
+    part3_lines = (line for line in part3_file if line.strip())
+    for qid in part1_data:
+        if qid in part2_grouped and len(part2_grouped[qid]) == 3:
+            line = next(part3_lines, None)
+            if line is None:
+                print(f"警告：Part3 数据不足，已用完 {used_part3} 条。")
+                break
+            part3_item = json.loads(line)
             used_part3 += 1
-        else:
-            print(f"警告：Part3 数据不足，已用完 {used_part3} 条。")
-            break
 
-        sample = {
-            "poid": str(counter).zfill(3),
-            "content": {
-                "part1": part1_data[qid],
-                "part2": part2_grouped[qid],
-                "part3": [part3_item]  # 注意此处是 list 包裹
+            sample = {
+                "poid": str(counter).zfill(3),
+                "content": {
+                    "part1": part1_data[qid],
+                    "part2": part2_grouped[qid],
+                    "part3": [part3_item]  # 注意此处是 list 包裹
+                }
             }
-        }
-        combined.append(sample)
-        counter += 1
-
-print(f"✅ 共生成 {len(combined)} 条记录。")
+            out.write(sample)
+            counter += 1
 
-# === 写入输出 ===
-with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(combined, f, ensure_ascii=False, indent=2)
+print(f"✅ 共生成 {out.count} 条记录。")
@@ -1,6 +1,7 @@
 from pathlib import Path
 import json
 import random
+import time
 from collections import defaultdict
 
 # ========== 输入路径 ==========
@@ -34,32 +35,93 @@ used_signatures = set()
 def dialogue_signature(dialogue):
     return "\n".join([f"{list(d.keys())[0]}:{list(d.values())[0]}" for d in dialogue])
 
-# ===== 提取指定类型的对话片段 =====
-def extract_dialogue_by_type(entry, t_type):
+# ===== 提取对话片段 =====
+def dialogue_at(entry, msg_idx):
     messages = entry["messages"]
-    template_index = entry["template_index"]
-
-    for idx, t in enumerate(template_index):
-        if t == t_type:
-            msg_idx = idx + 1
-            if 0 < msg_idx < len(messages):
-                prev_model = messages[msg_idx - 1].get("model_respond", "")
-                user = messages[msg_idx].get("user", "")
-                model_resp = messages[msg_idx].get("model_respond", "")
-                dialogue = [
-                    {"model_respond": prev_model},
-                    {"user": user},
-                    {"model_respond": model_resp}
-                ]
-                sig = dialogue_signature(dialogue)
-                if sig not in used_signatures:
-                    used_signatures.add(sig)
-                    return {
-                        "question": entry["question"],
-                        "dialogue": dialogue
-                    }
+    return [
+        {"model_respond": messages[msg_idx - 1].get("model_respond", "")},
+        {"user": messages[msg_idx].get("user", "")},
+        {"model_respond": messages[msg_idx].get("model_respond", "")}
+    ]
+
+# ===== 预建索引 =====
+# 原来每个 (qid, 类型, 模型) 都要线性扫描全部对话，找不到时还要重建并打乱 fallback 池。
+# 这里先建好索引，构建过程中只做查找：
+#   own_entries[model][qid]   本题的各条对话（文件顺序）
+#   part1_pool[model]         fallback：part1 候选题目的对话
+#   any_pool[model]           fallback 放宽：任意题目的对话
+# fallback 池只随机打乱一次，每种类型一个只前进的游标：签名一旦用过就永远不会再被选中，
+# 某条对话中类型 t 的片段都用完后，游标跳过它不必回头，整个构建是线性时间。
+# 与原来一样取“第一条还有可用片段的对话中、第一个可用的片段”，签名只在被检查到时才计算。
+_signatures = {}
+def slot_signature(entry, msg_idx):
+    key = (id(entry), msg_idx)
+    sig = _signatures.get(key)
+    if sig is None:
+        sig = _signatures[key] = dialogue_signature(dialogue_at(entry, msg_idx))
+    return sig
+
+def first_unused(entry, t_type):
+    """entry 中第一个类型为 t_type、签名未用过的片段位置（messages 下标）；没有返回 None。"""
+    messages = entry["messages"]
+    for idx, t in enumerate(entry["template_index"]):
+        msg_idx = idx + 1
+        if t == t_type and msg_idx < len(messages) and slot_signature(entry, msg_idx) not in used_signatures:
+            return msg_idx
+    return None
+
+class EntryPool:
+    def __init__(self, entries):
+        self.entries = list(entries)
+        random.shuffle(self.entries)
+        self.cursors = defaultdict(int)  # 类型 -> 游标
+
+    def find(self, t_type, exclude_qid):
+        """-> (entry, msg_idx)，跳过属于 exclude_qid 的对话；没有返回 None。"""
+        entries = self.entries
+        i = self.cursors[t_type]
+        while i < len(entries) and first_unused(entries[i], t_type) is None:
+            i += 1
+        self.cursors[t_type] = i
+        # 属于本题的对话只是暂时跳过（其它题目还可以用），不移动游标
+        for j in range(i, len(entries)):
+            entry = entries[j]
+            if entry["id"] != exclude_qid:
+                msg_idx = first_unused(entry, t_type)
+                if msg_idx is not None:
+                    return entry, msg_idx
+        return None
+
+def extract_dialogue(entry, msg_idx):
+    used_signatures.add(slot_signature(entry, msg_idx))
+    return {
+        "question": entry["question"],
+        "dialogue": dialogue_at(entry, msg_idx)
+    }
+
+def pick(model_name, qid, t):
+    # ===== 1）本题中查找 =====
+    for entry in own_entries[model_name].get(qid, []):
+        msg_idx = first_unused(entry, t)
+        if msg_idx is not None:
+            return extract_dialogue(entry, msg_idx)
+    # ===== 2）fallback：其它 part1 中题目 =====
+    # ===== 3）fallback 放宽：允许任意题目 =====
+    for pool in (part1_pool[model_name], any_pool[model_name]):
+        found = pool.find(t, exclude_qid=qid)
+        if found is not None:
+            return extract_dialogue(*found)
     return None
 
+start_time = time.perf_counter()
+own_entries, part1_pool, any_pool = {}, {}, {}
+for model_name, entries in model_entries.items():
+    own_entries[model_name] = defaultdict(list)
+    for entry in entries:
+        own_entries[model_name][entry["id"]].append(entry)
+    part1_pool[model_name] = EntryPool(e for e in entries if e["id"] in candidate_qids_set)
+    any_pool[model_name] = EntryPool(entries)
+
 # ===== 构建 Part2 =====
 final_blocks = []
 for qid in candidate_qids:
@@ -71,45 +133,11 @@ for qid in candidate_qids:
         success = True
 
         for model_name in ["DeepSeek-V3", "o4-mini", "Spark_X1"]:
-            found = False
-
-            # ===== 1）本题中查找 =====
-            for entry in model_entries[model_name]:
-                if entry["id"] == qid:
-                    result = extract_dialogue_by_type(entry, t)
-                    if result:
-                        content[model_name] = result
-                        found = True
-                        break
-
-            # ===== 2）fallback：其它 part1 中题目 =====
-            if not found:
-                fallback_pool = [
-                    e for e in model_entries[model_name]
-                    if e["id"] in candidate_qids_set and e["id"] != qid
-                ]
-                random.shuffle(fallback_pool)
-                for entry in fallback_pool:
-                    result = extract_dialogue_by_type(entry, t)
-                    if result:
-                        content[model_name] = result
-                        found = True
-                        break
-
-            # ===== 3）fallback 放宽：允许任意题目 =====
-            if not found:
-                fallback_pool = [e for e in model_entries[model_name] if e["id"] != qid]
-                random.shuffle(fallback_pool)
-                for entry in fallback_pool:
-                    result = extract_dialogue_by_type(entry, t)
-                    if result:
-                        content[model_name] = result
-                        found = True
-                        break
-
-            if not found:
+            result = pick(model_name, qid, t)
+            if result is None:
                 success = False
                 break
+            content[model_name] = result
 
         if success:
             type_blocks.append({
@@ -125,10 +153,11 @@ for qid in candidate_qids:
         final_blocks.extend(type_blocks)
         if len(final_blocks) >= 300:
             break
+elapsed = time.perf_counter() - start_time
 
 # ===== 保存结果 =====
 with open(output_path, "w", encoding="utf-8") as f:
     for block in final_blocks:
         f.write(json.dumps(block, ensure_ascii=False) + "\n")
 
-print(f"✅ Part2 构造完成，共 {len(final_blocks)} 条，来自 {len(final_blocks)//3} 道题")
\ No newline at end of file
+print(f"✅ Part2 构造完成，共 {len(final_blocks)} 条，来自 {len(final_blocks)//3} 道题，构建耗时 {elapsed:.3f}s")
\ No newline at end of file
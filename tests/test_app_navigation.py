@@ -0,0 +1,111 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import score_store
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO, "app.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO)
+    monkeypatch.setattr(score_store, "_store", None)
+    monkeypatch.setattr(score_store, "SCORE_DB_PATH", str(tmp_path / "scores.db"))
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.run()
+    at.text_input[0].input("T000")
+    button(at, "开始评估").click()
+    at.run()
+    at.toggle(key="form_mode").set_value(True)
+    at.run()
+    yield at
+    if score_store._store is not None:
+        score_store._store.close()
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def warnings(at):
+    return [w.value for w in at.warning if "离开后这些改动会丢失" in w.value]
+
+
+def next_page(at):
+    button(at, "下一条").click()
+    at.run()
+    assert not at.exception
+
+
+def test_untouched_and_restored_pages_do_not_warn(app):
+    next_page(app)
+    assert app.session_state.page == 1 and not warnings(app)
+
+    # 完成排序并保存后翻页，回到上一条（评分簿中已有分值）再翻页，均不提示
+    ranking = app.multiselect[0]
+    for option in ranking.options:
+        ranking.select(option)
+    button(app, "💾 保存 Part 1 评分").click()
+    app.run()
+    next_page(app)
+    assert app.session_state.page == 2 and not warnings(app)
+    button(app, "上一条").click()
+    app.run()
+    next_page(app)
+    assert app.session_state.page == 2 and not warnings(app)
+
+
+def test_incomplete_ranking_warns_until_confirmed(app):
+    app.multiselect[0].select("模型1")
+    button(app, "💾 保存 Part 1 评分").click()
+    app.run()
+
+    next_page(app)
+    assert app.session_state.page == 0
+    assert warnings(app) and "Part 1" in warnings(app)[0]
+
+    # 确认只对当前页有效：换页后作废，回来后再有未保存的排序仍会提示
+    app.session_state.page = 1
+    app.run()
+    assert app.session_state.pending_nav is None
+    app.session_state.page = 0
+    app.run()
+    app.multiselect[0].select("模型2")
+    button(app, "💾 保存 Part 1 评分").click()
+    app.run()
+    next_page(app)
+    assert app.session_state.page == 0 and warnings(app)
+
+    next_page(app)
+    assert app.session_state.page == 1
+
+
+def login(monkeypatch, tmp_path, admin_ids, input_id):
+    monkeypatch.chdir(REPO)
+    monkeypatch.setattr(score_store, "_store", None)
+    monkeypatch.setattr(score_store, "SCORE_DB_PATH", str(tmp_path / "scores.db"))
+    if admin_ids is None:
+        monkeypatch.delenv("EVAL_ADMIN_IDS", raising=False)
+    else:
+        monkeypatch.setenv("EVAL_ADMIN_IDS", admin_ids)
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.run()
+    at.text_input[0].input(input_id)
+    button(at, "开始评估").click()
+    at.run()
+    return at
+
+
+def test_admin_page_disabled_without_env(tmp_path, monkeypatch):
+    at = login(monkeypatch, tmp_path, None, "A0000")
+    assert "is_admin" not in at.session_state
+    assert any("无效的教师编号" in w.value for w in at.warning)
+
+
+def test_admin_page_uses_env_ids(tmp_path, monkeypatch):
+    at = login(monkeypatch, tmp_path, " X9 , Y8 ", "Y8")
+    assert at.session_state.is_admin
+    assert not at.exception
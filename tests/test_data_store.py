@@ -0,0 +1,41 @@
+import json
+
+import data_store
+
+
+def _write_dataset(path):
+    samples = [
+        {"poid": "001", "content": {"part3": [{"question_id": "q1", "type": "wrong"}]}},
+        {"poid": "002", "content": {"part3": []}},
+    ]
+    path.write_text(json.dumps(samples, ensure_ascii=False), encoding="utf-8")
+    return samples
+
+
+def test_in_memory_fallback_when_store_cannot_be_built(tmp_path, monkeypatch):
+    path = tmp_path / "data_T999.json"
+    samples = _write_dataset(path)
+
+    def unwritable(json_path):
+        raise PermissionError("read-only data directory")
+
+    monkeypatch.setattr(data_store, "build_sample_store", unwritable)
+    data_store.clear_cache()
+    dataset = data_store.load_dataset(str(path))
+
+    assert isinstance(dataset, data_store.Dataset)
+    assert list(dataset) == samples
+    assert dataset.get_by_poid("002") == samples[1]
+    assert dataset.part3_type("001", "q1") == "wrong"
+    assert dataset.part3_type("002", "q1") == "correct"
+
+
+def test_sample_store_matches_source(tmp_path):
+    path = tmp_path / "data_T998.json"
+    samples = _write_dataset(path)
+    data_store.clear_cache()
+    store = data_store.load_dataset(str(path))
+
+    assert isinstance(store, data_store.SampleStore)
+    assert [store[i] for i in range(len(store))] == samples
+    assert store.part3_type("001", "q1") == "wrong"
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import export_scores
+from data_store import Dataset
+from score_model import PART1_DIMENSIONS, ScoreBook
+
+
+def _book_and_dataset():
+    samples = [
+        {"poid": "001", "content": {"part3": [{"question_id": "q1", "type": "error"}]}},
+        {"poid": "002", "content": {"part3": []}},
+    ]
+    book = ScoreBook("T999")
+    for poid in ("001", "002"):
+        for rank, model in enumerate("ABC", 1):
+            book.set("part1", poid, "", PART1_DIMENSIONS[0], model, rank)
+    book.set("part1", "001", "", "过程正确", "B", 2)
+    book.set("part3", "001", "q1", 0, "A", 1)
+    return book, Dataset("data_T999.json", 0, samples)
+
+
+def _download_app(fmt):
+    import streamlit as st
+
+    import export_scores
+    from tests.test_export_scores import _book_and_dataset
+
+    book, dataset = _book_and_dataset()
+    data = export_scores.export_to_bytes(export_scores.iter_score_rows(book, dataset), fmt)
+    ext, mime = export_scores.FORMATS[fmt]
+    st.download_button("下载", data=data, file_name=f"评分结果.{ext}", mime=mime)
+
+
+@pytest.mark.parametrize("fmt", list(export_scores.FORMATS))
+def test_export_is_accepted_by_download_button(fmt):
+    at = AppTest.from_function(_download_app, args=(fmt,))
+    at.run()
+    assert not at.exception
+
+
+def test_export_csv_and_jsonl_rows():
+    book, dataset = _book_and_dataset()
+    data = export_scores.export_to_bytes(export_scores.iter_score_rows(book, dataset), "CSV")
+    assert isinstance(data, bytes)
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+    assert [r["dimension"] for r in rows if r["poid"] == "001"] == [PART1_DIMENSIONS[0], "过程正确", "正确理解"]
+    assert rows[0]["sample_index_display"] == "1 / 2"
+
+    data = export_scores.export_to_bytes(export_scores.iter_score_rows(book, dataset), "JSONL")
+    assert [json.loads(line) for line in data.decode("utf-8").splitlines()] == [
+        {k: (v if v == "" else float(v) if k.startswith("score_") else v) for k, v in r.items()} for r in rows
+    ]
+
+
+def test_part2_type_keeps_block0_label(tmp_path):
+    book, dataset = _book_and_dataset()
+    for block_idx in (0, 2):
+        book.set("part2", "001", block_idx, "1", "A", 3)
+    data = export_scores.export_to_bytes(export_scores.iter_score_rows(book, dataset), "CSV")
+    rows = [r for r in csv.DictReader(io.StringIO(data.decode("utf-8-sig"))) if r["part"] == "part2"]
+    assert [r["type"] for r in rows] == ["引导质量（理解）_block0"] * 2
+
+    # 同类型的多个块在 score_tables 中按出现序号区分为不同的评分单元
+    import score_tables
+
+    path = tmp_path / "评分结果_T999_20260101_000000.csv"
+    path.write_bytes(data)
+    table = score_tables.load_exports([str(path)])
+    part2_units = [u for u in table.units if u[1] == "part2"]
+    assert part2_units == [("001", "part2", "引导质量（理解）_block0", "引导质量（理解）", n) for n in (0, 1)]
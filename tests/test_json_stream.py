@@ -0,0 +1,7 @@
+from json_stream import iter_strings
+
+
+def test_iter_strings_yields_values_in_order():
+    node = {"question": "题目 $x$", "part2": [{"type": 1, "content": {"A": ["问", "答"]}}], "n": None}
+    assert list(iter_strings(node)) == ["题目 $x$", "问", "答"]
+    assert list(iter_strings("单独的字符串")) == ["单独的字符串"]
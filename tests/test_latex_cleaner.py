@@ -0,0 +1,121 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+import latex_cleaner
+from latex_cleaner import LatexCleaner, clean_files
+
+MARKER = "原始内容如下："
+
+
+def build_prompt(text: str) -> str:
+    return f"把 \\(..\\) 改成 $$..$$。\n{MARKER}\n{text}"
+
+
+def fix(text: str) -> str:
+    return re.sub(r"\\\((.*?)\\\)", r"$$\1$$", text)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持连接，和真实接口一样复用连接池
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][0]["content"]
+        if "JSON 数组" in prompt:
+            texts = json.loads(prompt.split("输入：", 1)[1])
+            content = json.dumps([fix(t) for t in texts], ensure_ascii=False)
+        else:
+            content = fix(prompt.split(MARKER, 1)[1].strip())
+        data = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def iter_fields(data, start=0):
+    for i, sample in enumerate(data, start):
+        yield f"{i}/text", sample, "text"
+
+
+def make_cleaner(url, batch_tokens=0):
+    client = openai.AsyncOpenAI(base_url=url, api_key="stub", max_retries=0)
+    return LatexCleaner(client, build_prompt, rps=1000, local=False, batch_tokens=batch_tokens)
+
+
+@pytest.mark.parametrize("batch_tokens", [0, 1500])
+def test_clean_files_reuses_client_across_rounds(tmp_path, stub_url, monkeypatch, batch_tokens):
+    # 每轮 2 个样本，5 个样本共 3 轮，每轮都要请求接口
+    monkeypatch.setattr(latex_cleaner, "STREAM_SAMPLES", 2)
+    samples = [{"text": f"第 {i} 题：\\(x+{i}\\)"} for i in range(5)]
+    source = tmp_path / "data.json"
+    source.write_text(json.dumps(samples, ensure_ascii=False), encoding="utf-8")
+
+    cleaner = make_cleaner(stub_url, batch_tokens)
+    outputs = clean_files([str(source)], iter_fields, cleaner)
+
+    with open(outputs[0], "r", encoding="utf-8") as f:
+        fixed = json.load(f)
+    assert [s["text"] for s in fixed] == [f"第 {i} 题：$$x+{i}$$" for i in range(5)]
+    assert not (tmp_path / "data_fixed.journal.jsonl").exists()
+
+
+def _truncated_journal(path):
+    """一条完整记录 + 一条截断在多字节字符中间的记录（模拟写到一半时崩溃）。"""
+    complete = latex_cleaner._journal_line("0/text", latex_cleaner.text_hash("第 0 题：\\(x+0\\)"), "第 0 题：$$x+0$$")
+    partial = latex_cleaner._journal_line("1/text", latex_cleaner.text_hash("第 1 题"), "第 1 题：$$x+1$$")
+    cut = partial.index("题".encode("utf-8")) + 1  # 切在“题”的 3 个字节中间
+    path.write_bytes(complete + partial[:cut])
+    with pytest.raises(UnicodeDecodeError):
+        path.read_bytes().decode("utf-8")
+
+
+def test_journal_with_truncated_multibyte_tail(tmp_path):
+    path = tmp_path / "data_fixed.journal.jsonl"
+    _truncated_journal(path)
+
+    assert list(latex_cleaner.load_journal(str(path))) == ["0/text"]
+
+    with latex_cleaner._open_journal(str(path)) as f:
+        f.write(latex_cleaner._journal_line("2/text", "h", "结果"))
+    done = latex_cleaner.load_journal(str(path))
+    assert done["2/text"] == ("h", "结果")
+    assert set(done) == {"0/text", "2/text"}
+
+
+def test_resume_after_truncated_journal(tmp_path, stub_url):
+    samples = [{"text": f"第 {i} 题：\\(x+{i}\\)"} for i in range(3)]
+    source = tmp_path / "data.json"
+    source.write_text(json.dumps(samples, ensure_ascii=False), encoding="utf-8")
+    _truncated_journal(tmp_path / "data_fixed.journal.jsonl")
+
+    cleaner = make_cleaner(stub_url)
+    outputs = clean_files([str(source)], iter_fields, cleaner)
+
+    assert cleaner.stats["resumed"] == 1
+    assert cleaner.stats["requests"] == 2
+    with open(outputs[0], "r", encoding="utf-8") as f:
+        assert [s["text"] for s in json.load(f)] == [f"第 {i} 题：$$x+{i}$$" for i in range(3)]
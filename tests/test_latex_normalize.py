@@ -0,0 +1,34 @@
+import pytest
+
+from latex_normalize import normalize, prose_unchanged
+
+
+@pytest.mark.parametrize("original, fixed", [
+    ("\\(x\\) 等于 1", "$$x$$ 等于 1"),
+    ("本题答案为 (\\boxed{0})。", "本题答案为 $$\\boxed{0}$$。"),
+    ("面积是 \\frac{1}{2} 平方米", "面积是 $$\\frac{1}{2}$$ 平方米"),
+    ("\\[x+1\\]，所以 n=2", "$$ x+1 $$，所以 n=2"),
+    ("未闭合 \\(x+1", "未闭合 $$x+1$$"),
+])
+def test_delimiter_changes_accepted(original, fixed):
+    assert prose_unchanged(original, fixed)
+
+
+@pytest.mark.parametrize("original, fixed", [
+    ("x 等于 1", "x 等于 2"),                        # 正文中的数字
+    ("面积 is 5 平方米", "面积 was 5 平方米"),        # 正文中的英文单词
+    ("a, b 两数", "a; b 两数"),                      # ASCII 标点
+    ("\\(x\\) 等于 1", "$$y$$ 等于 1"),              # 公式内容
+    ("第一步。", "第二步。"),
+    ("第一步。", "  "),
+])
+def test_edits_outside_delimiters_rejected(original, fixed):
+    assert not prose_unchanged(original, fixed)
+
+
+def test_local_normalize_passes_its_own_check():
+    text = "由 \\(a^2\\) 得（\\boxed{3}），即 $x$ 和 \\[y\\]"
+    fixed, ambiguous = normalize(text)
+    assert not ambiguous
+    assert fixed == "由 $$a^2$$ 得$$\\boxed{3}$$，即 $x$ 和 $$y$$"
+    assert prose_unchanged(text, fixed)
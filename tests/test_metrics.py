@@ -0,0 +1,29 @@
+import metrics
+
+
+def _fragment():
+    metrics.add_markdown_bytes(5)
+
+
+def test_fragment_rerun_recorded_outside_full_rerun():
+    metrics.reset()
+    fragment = metrics.timed("render_x")(_fragment)
+
+    with metrics.rerun():
+        metrics.add_markdown_bytes(10)
+        fragment()
+    fragment()  # 只重跑 fragment：不经过入口处的 rerun()
+
+    snap = metrics.snapshot()
+    assert snap["rerun.total"]["count"] == 1
+    assert snap["rerun.markdown_bytes"]["max"] == 15
+    assert snap["fragment_rerun.total"]["count"] == 1
+    assert snap["fragment_rerun.markdown_bytes"]["max"] == 5
+    assert snap["render_x"]["count"] == 2
+    assert not metrics.in_rerun()
+
+
+def test_markdown_bytes_ignored_outside_rerun():
+    metrics.reset()
+    metrics.add_markdown_bytes(7)
+    assert metrics.snapshot() == {}
@@ -0,0 +1,8 @@
+import app
+
+
+def test_hourly_rate_uses_minimum_window():
+    # 开始几秒后完成 1 条：按 15 分钟计，而不是每小时几千条
+    assert app.hourly_rate(1, 1000.0, 1004.5) == 4.0
+    assert app.hourly_rate(0, 1000.0, 1000.0) == 0.0
+    assert app.hourly_rate(6, 0.0, 2 * 3600.0) == 3.0
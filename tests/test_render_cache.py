@@ -0,0 +1,54 @@
+import render_cache
+
+TURNS = [{"user": "题目 $x$"}, {"model_respond": "答 $$y$$"}, {"user": "懂了"}]
+
+
+def test_dialog_panel_keyed_by_slot_and_shown_turns():
+    render_cache._cache.clear()
+    slot = ("data_T999.json", 1, 0, "part1", "A")
+    full = render_cache.dialog_panel(TURNS, slot, "模型1", 650)
+    assert full == render_cache.build_dialog_panel(TURNS, "模型1", 650)
+    # 同一位置只显示前两轮、换模型名、换位置都是不同的片段
+    assert render_cache.dialog_panel(TURNS[:2], slot, "模型1", 650) == render_cache.build_dialog_panel(TURNS[:2], "模型1", 650)
+    assert "模型2" in render_cache.dialog_panel(TURNS, slot, "模型2", 650)
+    other = render_cache.dialog_panel(TURNS[1:], slot[:-1] + ("B",), "模型1", 650)
+    assert other == render_cache.build_dialog_panel(TURNS[1:], "模型1", 650)
+    assert render_cache.dialog_panel(TURNS, slot, "模型1", 650) is full
+    assert render_cache._cache.stats()["misses"] == 4
+
+
+def test_math_table_update_invalidates_entries(tmp_path, monkeypatch):
+    render_cache._cache.clear()
+    monkeypatch.setattr(render_cache, "_math", {})
+    monkeypatch.setattr(render_cache, "_math_files", {})
+    before = render_cache.textblock("面积 $x$")
+    assert "$x$" in before
+
+    json_path = tmp_path / "data_T999.json"
+    (tmp_path / "data_T999.math.json").write_text('{"formulas": {"$x$": "<math>x</math>"}}', encoding="utf-8")
+    render_cache.load_math_table(str(json_path))
+    assert render_cache.textblock("面积 $x$") == "面积 <math>x</math>"
+    assert render_cache.single_panel("$x$", "好", "模型1") == render_cache.build_single_panel("$x$", "好", "模型1")
+
+
+def test_dialog_table_puts_turn_i_of_every_model_in_row_i():
+    render_cache._cache.clear()
+    model_turns = [
+        [{"user": "题目"}, {"model_respond": "A1"}, {"model_respond": "A2"}],
+        [{"user": "题目"}, {"model_respond": "B1"}],
+        [{"user": "题目"}, {"model_respond": "C1"}, {"model_respond": "C2"}],
+    ]
+    names = ["模型1", "模型2", "模型3"]
+    html = render_cache.dialog_table(model_turns, ("data_T999.json", 1, 0, "part1", ("A", "B", "C")), names, 650,
+                                     skip_first_user=True)
+    assert html == render_cache.build_dialog_table(model_turns, names, 650, skip_first_user=True)
+
+    rows = html.split("<tr>\n")[1:]
+    assert len(rows) == 3
+    assert "题目" not in rows[0] and rows[0].count("&nbsp;") == 3  # 第一轮学生发言即题目，不重复展示
+    assert ["A1" in rows[1], "B1" in rows[1], "C1" in rows[1]] == [True, True, True]
+    assert "A2" in rows[2] and "C2" in rows[2] and rows[2].count("&nbsp;") == 1
+    assert rows[1].index("A1") < rows[1].index("B1") < rows[1].index("C1")
+    # 只显示前两轮是另一个片段
+    assert "A2" not in render_cache.dialog_table([t[:2] for t in model_turns],
+                                                 ("data_T999.json", 1, 0, "part1", ("A", "B", "C")), names, 650, True)
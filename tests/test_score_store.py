@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+import score_store
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(score_store, "_store", None)
+    yield
+    if score_store._store is not None:
+        score_store._store.close()
+
+
+def test_get_store_opens_given_path(tmp_path, fresh_store):
+    db_path = str(tmp_path / "scores.db")
+    store = score_store.get_store(db_path)
+    assert store.db_path == db_path
+    assert score_store.get_store() is store
+    with pytest.raises(ValueError):
+        score_store.get_store(str(tmp_path / "other.db"))
+
+
+def test_default_path_is_read_at_call_time(tmp_path, monkeypatch, fresh_store):
+    db_path = str(tmp_path / "runtime.db")
+    monkeypatch.setattr(score_store, "SCORE_DB_PATH", db_path)
+    assert score_store.get_store().db_path == db_path
+    assert os.path.exists(db_path)
+
+
+def test_load_test_never_opens_real_db(tmp_path, monkeypatch, fresh_store):
+    import load_test
+
+    real_db = os.path.join(REPO, score_store.SCORE_DB_PATH)
+    opened = []
+    connect = sqlite3.connect
+
+    def recording_connect(path, *args, **kwargs):
+        opened.append(os.path.abspath(path))
+        return connect(path, *args, **kwargs)
+
+    monkeypatch.setattr(sqlite3, "connect", recording_connect)
+    monkeypatch.chdir(REPO)
+    monkeypatch.setattr(score_store, "SCORE_DB_PATH", score_store.SCORE_DB_PATH)  # main() 会改写，测试后还原
+    db_path = str(tmp_path / "load.db")
+    monkeypatch.setattr(sys, "argv", ["load_test.py", "--teachers", "1", "--pages", "1", "--db", db_path])
+    load_test.main()
+
+    assert opened and all(path != real_db for path in opened)
+    assert db_path in opened
+
+
+def test_unchanged_scores_are_not_recorded_and_nothing_is_kept_after_flush(tmp_path, fresh_store):
+    store = score_store.get_store(str(tmp_path / "scores.db"))
+    calls = []
+    book = store.load_book("T999")
+    book.on_change = lambda *args: (calls.append(args), store.record(*args))
+
+    for _ in range(3):  # 控件每次重跑都会写一遍
+        book.set("part1", "001", "", "过程正确", "A", 1)
+        book.set("part1", "001", "", "提问质量", "B", 0.0)
+    assert len(calls) == 2
+    book.set("part1", "001", "", "过程正确", "A", 0)
+    assert len(calls) == 3
+
+    assert store.flush() == 2
+    assert store._pending == {} and not hasattr(store, "_known")
+
+    # 从评分库恢复的分值再次写入同样的值时不回调
+    restored = store.load_book("T999")
+    restored.on_change = lambda *args: calls.append(args)
+    restored.set("part1", "001", "", "过程正确", "A", 0)
+    restored.set("part1", "001", "", "提问质量", "B", 0.0)
+    assert len(calls) == 3
+    assert restored.get("part1", "001", "", "过程正确", "A") == 0